@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark quantized conversation memory against full-precision search
+
+Runs offline: turns are synthetic (seeded) vectors clustered by topic, so no
+embedding calls are made. Exact float32 search over each conversation is the
+reference for recall@k; ChromaDB is included when installed.
+
+Usage:
+    python benchmarks/conversation_memory_bench.py --conversations 200 --turns 100 --dim 1536
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.quantized_store import QuantizedClient, normalize, INT8, FLOAT16, RESCORE_FLOAT32, RESCORE_FLOAT16, RESCORE_NONE
+
+CONFIGS = [
+    (INT8, RESCORE_FLOAT32),
+    (INT8, RESCORE_FLOAT16),
+    (INT8, RESCORE_NONE),
+    (FLOAT16, RESCORE_NONE),
+]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.asarray(samples) * 1000, q))
+
+
+def synthetic_memory(rng, conversations, turns, dim, topics=32):
+    """Turns drawn around a few topic centres per conversation, like real chat history"""
+    centres = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors, owners = [], []
+    for c in range(conversations):
+        picks = rng.integers(0, topics, size=turns)
+        vectors.append(centres[picks] + 0.8 * rng.standard_normal((turns, dim)).astype(np.float32))
+        owners += [f"conv_{c}"] * turns
+    return normalize(np.vstack(vectors)), owners
+
+
+def exact_top_k(vectors, owners, query, conversation_id, k):
+    rows = np.flatnonzero(np.asarray(owners) == conversation_id)
+    scores = vectors[rows] @ query
+    return [f"turn_{rows[i]}" for i in np.argsort(-scores)[:k]]
+
+
+def recall(found, expected):
+    return len(set(found) & set(expected)) / len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized conversation memory")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors, owners = synthetic_memory(rng, args.conversations, args.turns, args.dim)
+    ids = [f"turn_{i}" for i in range(len(vectors))]
+    metadatas = [{"conversation_id": owner} for owner in owners]
+    targets = rng.integers(0, len(vectors), size=args.queries)
+    queries = normalize(vectors[targets] + 0.3 * rng.standard_normal((args.queries, args.dim)).astype(np.float32))
+    expected = [exact_top_k(vectors, owners, q, owners[t], args.k) for q, t in zip(queries, targets)]
+    print(f"{len(vectors)} turns in {args.conversations} conversations, dim={args.dim}, "
+          f"float32 vectors = {vectors.nbytes / 2**20:.1f} MiB\n")
+
+    workdir = tempfile.mkdtemp(prefix="conversation_memory_bench_")
+    rows = []
+    try:
+        for code_dtype, rescore in CONFIGS:
+            client = QuantizedClient(os.path.join(workdir, f"{code_dtype}_{rescore}.sqlite3"), code_dtype, rescore)
+            collection = client.get_or_create_collection("user_conversations")
+            for start in range(0, len(vectors), 1000):
+                end = start + 1000
+                collection.upsert(ids[start:end], vectors[start:end], ids[start:end], metadatas[start:end])
+            timings, recalls = [], []
+            for q, t, truth in zip(queries, targets, expected):
+                started = time.perf_counter()
+                found = collection.query([q], n_results=args.k, where={"conversation_id": owners[t]})["ids"][0]
+                timings.append(time.perf_counter() - started)
+                recalls.append(recall(found, truth))
+            stats = client.stats()
+            rows.append((f"{code_dtype}+{rescore}", recalls, timings, stats["memory_bytes"], stats["disk_bytes"]))
+
+        try:
+            import chromadb
+            chroma = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+            collection = chroma.create_collection(name="bench_conversations")
+            for start in range(0, len(vectors), 1000):
+                end = start + 1000
+                collection.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(), metadatas=metadatas[start:end])
+            timings, recalls = [], []
+            for q, t, truth in zip(queries, targets, expected):
+                started = time.perf_counter()
+                found = collection.query(query_embeddings=[q.tolist()], n_results=args.k,
+                                         where={"conversation_id": owners[t]})["ids"][0]
+                timings.append(time.perf_counter() - started)
+                recalls.append(recall(found, truth))
+            disk = sum(os.path.getsize(os.path.join(root, f))
+                       for root, _, files in os.walk(os.path.join(workdir, "chroma")) for f in files)
+            rows.append(("chromadb (float32)", recalls, timings, vectors.nbytes, disk))
+        except ImportError:
+            print("chromadb not installed, skipping the ChromaDB comparison\n")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'store':<20} {'recall@' + str(args.k):>9} {'p50 ms':>8} {'p95 ms':>8} {'memory MiB':>11} "
+          f"{'vs f32':>7} {'disk MiB':>9}")
+    for name, recalls, timings, memory, disk in rows:
+        print(f"{name:<20} {np.mean(recalls):9.4f} {percentile_ms(timings, 50):8.3f} {percentile_ms(timings, 95):8.3f} "
+              f"{memory / 2**20:11.2f} {vectors.nbytes / max(memory, 1):6.1f}x {disk / 2**20:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
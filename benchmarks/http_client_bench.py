@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark a fresh httpx.AsyncClient per tool call against the shared pooled client
+
+Starts a local mock of the OpenWeatherMap endpoints (optionally over TLS with
+a throwaway self-signed certificate) and times the same weather calls made
+the old way (a new client, so a new connection, per call) and through the
+application's pooled client.
+
+Usage:
+    python benchmarks/http_client_bench.py --calls 200
+    python benchmarks/http_client_bench.py --calls 200 --tls --concurrency 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from services.http_client import create_http_client
+
+WEATHER_RESPONSE = json.dumps({
+    "name": "Paris", "sys": {"country": "FR"},
+    "main": {"temp": 18.2, "feels_like": 17.5, "humidity": 62},
+    "weather": [{"description": "scattered clouds"}], "wind": {"speed": 3.6},
+}).encode("utf-8")
+
+
+class MockWeatherHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    # Headers and body go out as separate writes; without this, delayed ACKs stall reused connections
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(WEATHER_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(WEATHER_RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(tls: bool, workdir: str) -> tuple:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockWeatherHandler)
+    scheme = "http"
+    if tls:
+        cert, key = os.path.join(workdir, "cert.pem"), os.path.join(workdir, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+             "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", key, "-out", cert],
+            check=True, capture_output=True,
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        # httpx trusts the throwaway certificate through the standard environment variable
+        os.environ["SSL_CERT_FILE"] = cert
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/data/2.5"
+
+
+async def timed_calls(base_url: str, calls: int, concurrency: int, shared) -> list:
+    url = f"{base_url}/weather?q=Paris&appid=bench&units=metric"
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            if shared is None:
+                async with httpx.AsyncClient() as client:
+                    response = await client.get(url)
+            else:
+                response = await shared.get(url)
+            response.json()
+            timings.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return timings
+
+
+def report(name: str, timings: list, wall: float):
+    ms = np.asarray(timings) * 1000
+    print(f"{name:<22} p50={np.percentile(ms, 50):7.3f} ms  p95={np.percentile(ms, 95):7.3f} ms  "
+          f"p99={np.percentile(ms, 99):7.3f} ms  throughput={len(timings) / wall:8.1f} calls/s")
+
+
+async def run(args, base_url: str):
+    # Warm up both paths once so imports and first-connection costs are not counted
+    await timed_calls(base_url, 2, 1, None)
+
+    started = time.perf_counter()
+    fresh = await timed_calls(base_url, args.calls, args.concurrency, None)
+    fresh_wall = time.perf_counter() - started
+
+    async with create_http_client(max_keepalive_connections=max(args.concurrency, 1)) as client:
+        await timed_calls(base_url, 2, 1, client)
+        started = time.perf_counter()
+        pooled = await timed_calls(base_url, args.calls, args.concurrency, client)
+        pooled_wall = time.perf_counter() - started
+
+    report("client per call", fresh, fresh_wall)
+    report("shared pooled client", pooled, pooled_wall)
+    saving = (np.median(fresh) - np.median(pooled)) * 1000
+    print(f"\nMedian saving per call: {saving:.3f} ms ({saving / (np.median(fresh) * 1000):.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-call vs pooled httpx clients")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--tls", action="store_true", help="Serve over TLS (requires the openssl CLI)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server, base_url = start_server(args.tls, workdir)
+        print(f"Mock weather API at {base_url}; {args.calls} calls, concurrency {args.concurrency}\n")
+        try:
+            asyncio.run(run(args, base_url))
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Measure the import time of a module with `python -X importtime` and enforce a budget
+
+Imports the module in a fresh interpreter, reports the total and the slowest
+top-level packages, and exits non-zero when the import exceeds the budget or
+pulls in a package that should only load on first use (torch, transformers,
+librosa, scipy, pandas, openpyxl by default). Suitable as a CI gate.
+
+Usage:
+    python benchmarks/import_time_bench.py
+    python benchmarks/import_time_bench.py main --budget-ms 1500 --runs 5
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_PACKAGES = ["torch", "transformers", "librosa", "scipy", "pandas", "openpyxl", "sentence_transformers", "soundfile"]
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_profile(module):
+    """(package -> cumulative microseconds for top-level imports, total microseconds, all imported names)"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    top_level, imported, total = {}, set(), 0
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        imported.add(name)
+        # Top-level entries (one space of indent) are what this import actually triggered
+        if indent == 1:
+            package = name.split(".")[0]
+            top_level[package] = top_level.get(package, 0) + cumulative
+            total += cumulative
+    return top_level, total, imported
+
+
+def eager_packages(imported, lazy=LAZY_PACKAGES):
+    """Packages from lazy that show up among the imported module names"""
+    return sorted(package for package in lazy
+                  if any(name == package or name.startswith(package + ".") for name in imported))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark and budget check")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to average over")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "2000")))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--lazy", default=",".join(LAZY_PACKAGES),
+                        help="Comma-separated packages that must not be imported")
+    args = parser.parse_args()
+
+    totals, profiles, imported = [], [], set()
+    for _ in range(args.runs):
+        top_level, total, names = import_profile(args.module)
+        totals.append(total)
+        profiles.append(top_level)
+        imported |= names
+
+    median_ms = statistics.median(totals) / 1000
+    packages = {package: statistics.median(profile.get(package, 0) for profile in profiles) / 1000
+                for package in set().union(*profiles)}
+    print(f"import {args.module}: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(totals) / 1000:.0f} ms, max {max(totals) / 1000:.0f} ms)\n")
+    print(f"{'package':<32} {'cumulative ms':>14}")
+    for package, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{package:<32} {ms:14.1f}")
+
+    failures = []
+    eager = eager_packages(imported, list(filter(None, args.lazy.split(","))))
+    if eager:
+        failures.append(f"imported packages that should load lazily: {', '.join(eager)}")
+    if median_ms > args.budget_ms:
+        failures.append(f"median import time {median_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+
+    print()
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"✅ Within the {args.budget_ms:.0f} ms budget and no lazy packages imported")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark the in-memory knowledge index against a ChromaDB query
+
+Runs offline: vectors are synthetic (seeded), so no embedding calls are made.
+Both backends get the same corpus and the same queries.
+
+Usage:
+    python benchmarks/knowledge_index_bench.py --entries 80 --dim 1536 --queries 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.vector_index import VectorIndex
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.asarray(samples) * 1000, q))
+
+
+def report(name, samples):
+    print(f"{name:<22} p50={percentile_ms(samples, 50):8.3f} ms  "
+          f"p95={percentile_ms(samples, 95):8.3f} ms  p99={percentile_ms(samples, 99):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark in-memory knowledge index vs ChromaDB")
+    parser.add_argument("--entries", type=int, default=80)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    corpus = rng.standard_normal((args.entries, args.dim)).astype(np.float32)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    # Queries are perturbed corpus vectors so each has a known nearest neighbour
+    targets = rng.integers(0, args.entries, size=args.queries)
+    queries = corpus[targets] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    ids = [f"knowledge_{i}" for i in range(args.entries)]
+
+    results = {}
+    for dtype in (np.float32, np.float16):
+        index = VectorIndex(ids, corpus, dtype=dtype)
+        timings, hits = [], 0
+        for q, target in zip(queries, targets):
+            started = time.perf_counter()
+            top = index.search(q, k=args.k)
+            timings.append(time.perf_counter() - started)
+            hits += top[0]["id"] == ids[target]
+        results[f"numpy-{np.dtype(dtype).name}"] = (timings, hits)
+
+        started = time.perf_counter()
+        index.search_batch(queries, k=args.k)
+        batch_time = time.perf_counter() - started
+        print(f"numpy-{np.dtype(dtype).name} batched: {args.queries} queries in {batch_time * 1000:.3f} ms "
+              f"({index.nbytes / 1024:.1f} KiB matrix)")
+
+    try:
+        import chromadb
+        client = chromadb.EphemeralClient()
+        collection = client.create_collection(name="bench_knowledge")
+        collection.add(ids=ids, embeddings=corpus.tolist(), documents=ids)
+        timings, hits = [], 0
+        for q, target in zip(queries, targets):
+            started = time.perf_counter()
+            top = collection.query(query_embeddings=[q.tolist()], n_results=args.k)
+            timings.append(time.perf_counter() - started)
+            hits += top["ids"][0][0] == ids[target]
+        results["chromadb"] = (timings, hits)
+    except ImportError:
+        print("chromadb not installed, skipping the ChromaDB comparison")
+
+    print()
+    for name, (timings, hits) in results.items():
+        report(name, timings)
+        print(f"{'':<22} top-1 accuracy={hits / args.queries:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Benchmark knowledge retrieval quality and latency for each backend
+
+Runs offline over travel_knowledge with a labeled query set
+(benchmarks/retrieval_queries.json). Embeddings come from a deterministic
+hashing embedder standing in for the real model, so absolute quality is lower
+than in production but backends are compared on equal terms, and numbers are
+reproducible run to run. Reports recall@k, MRR and p50/p95/p99 search latency
+(query embedding excluded) for:
+
+    chromadb        ChromaDB collection query (when chromadb is installed)
+    numpy           in-memory VectorIndex
+    bm25            keyword index alone
+    hybrid          VectorIndex + BM25 fused by reciprocal rank
+    hybrid+filters  hybrid within region/category prefilters, falling back to global
+    hybrid+rerank   hybrid candidates reranked by the cross-encoder (when it can be loaded)
+
+Usage:
+    python benchmarks/retrieval_bench.py --k 3 --repeat 20
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge.travel_knowledge import travel_knowledge
+from services.bm25 import BM25Index, fuse_hits, tokenize
+from services.knowledge_sync import knowledge_document, knowledge_hit, knowledge_id, knowledge_metadata, sync_keyword_index
+from services.query_filters import build_filter_chain
+from services.reranker import CrossEncoderReranker, RerankStage, DEFAULT_CROSS_ENCODER
+from services.vector_index import VectorIndex
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_queries.json")
+
+
+class HashingEmbedder:
+    """Deterministic stand-in for an embedding model: signed feature hashing of words and character n-grams"""
+
+    def __init__(self, dim: int = 384, ngram: int = 4):
+        self.dim = dim
+        self.ngram = ngram
+
+    def _features(self, text):
+        for token in tokenize(text):
+            stem = token[:-1] if len(token) > 3 and token.endswith("s") else token
+            yield stem, 1.0
+            padded = f"#{stem}#"
+            for i in range(max(1, len(padded) - self.ngram + 1)):
+                yield padded[i:i + self.ngram], 0.5
+
+    def __call__(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = hashlib.md5(feature.encode("utf-8")).digest()
+                index = int.from_bytes(digest[:4], "little") % self.dim
+                matrix[row, index] += weight if digest[4] & 1 else -weight
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.asarray(samples) * 1000, q))
+
+
+def evaluate(titles, relevant, k):
+    """recall@k and reciprocal rank of the first relevant title"""
+    recall = len(set(titles[:k]) & relevant) / len(relevant)
+    rank = next((i + 1 for i, title in enumerate(titles) if title in relevant), None)
+    return recall, 1.0 / rank if rank else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark knowledge retrieval backends")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="Labeled query set (JSON)")
+    parser.add_argument("--k", type=int, default=3, help="Cut-off for recall@k")
+    parser.add_argument("--depth", type=int, default=10, help="Results retrieved per query (for MRR)")
+    parser.add_argument("--candidates", type=int, default=20, help="Candidates per query for reranking")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed passes over the query set")
+    parser.add_argument("--rerank-model", default=DEFAULT_CROSS_ENCODER)
+    parser.add_argument("--no-rerank", action="store_true", help="Skip the cross-encoder backend")
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        labeled = json.load(f)
+    known_titles = {entry["title"] for entry in travel_knowledge}
+    for item in labeled:
+        unknown = set(item["relevant"]) - known_titles
+        if unknown:
+            raise SystemExit(f"Query {item['query']!r} labels unknown titles: {sorted(unknown)}")
+
+    embedder = HashingEmbedder(args.dim)
+    ids = [knowledge_id(entry) for entry in travel_knowledge]
+    documents = [knowledge_document(entry) for entry in travel_knowledge]
+    metadatas = [knowledge_metadata(entry) for entry in travel_knowledge]
+    hits_by_id = {doc_id: dict(knowledge_hit(entry), id=doc_id) for doc_id, entry in zip(ids, travel_knowledge)}
+
+    started = time.perf_counter()
+    corpus = embedder(documents)
+    print(f"Embedded {len(corpus)} entries with the hashing stand-in (dim={args.dim}) "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    queries = [item["query"] for item in labeled]
+    query_vectors = embedder(queries)
+
+    index = VectorIndex(ids, corpus, documents, metadatas)
+    keyword_index = BM25Index()
+    sync_keyword_index(keyword_index, travel_knowledge)
+    filter_chains = [build_filter_chain(query) for query in queries]
+
+    def vector_hits(q, limit, metadata_filter=None):
+        return [dict(hits_by_id[hit["id"]], distance=hit["distance"])
+                for hit in index.search(q, k=limit, metadata_filter=metadata_filter)]
+
+    def keyword_hits(query, limit, metadata_filter=None):
+        hits = keyword_index.search(query, k=len(keyword_index))
+        if metadata_filter is not None:
+            hits = [hit for hit in hits if metadata_filter.matches(hit["payload"])]
+        return hits[:limit]
+
+    def hybrid(i, limit, metadata_filter=None):
+        candidates = max(limit, 10)
+        return fuse_hits(vector_hits(query_vectors[i], candidates, metadata_filter),
+                         keyword_hits(queries[i], candidates, metadata_filter), limit)
+
+    def hybrid_filtered(i, limit):
+        for metadata_filter in filter_chains[i] + [None]:
+            hits = hybrid(i, limit, metadata_filter)
+            if metadata_filter is None or len(hits) >= min(limit, 2):
+                return hits
+
+    backends = {
+        "numpy": lambda i: [hit["title"] for hit in vector_hits(query_vectors[i], args.depth)],
+        "bm25": lambda i: [hit["payload"]["title"] for hit in keyword_hits(queries[i], args.depth)],
+        "hybrid": lambda i: [hit["title"] for hit in hybrid(i, args.depth)],
+        "hybrid+filters": lambda i: [hit["title"] for hit in hybrid_filtered(i, args.depth)],
+    }
+
+    try:
+        import chromadb
+        collection = chromadb.EphemeralClient().create_collection(name="bench_travel_knowledge")
+        collection.add(ids=ids, embeddings=corpus.tolist(), documents=documents, metadatas=metadatas)
+        backends = {
+            "chromadb": lambda i: [metadata["title"] for metadata in collection.query(
+                query_embeddings=[query_vectors[i].tolist()], n_results=args.depth)["metadatas"][0]],
+            **backends,
+        }
+    except ImportError:
+        print("chromadb not installed, skipping the ChromaDB backend")
+
+    if not args.no_rerank:
+        stage = RerankStage(CrossEncoderReranker(args.rerank_model), enabled=True,
+                            candidates=args.candidates, budget_seconds=None, max_context_tokens=10 ** 6, min_excerpt_tokens=0)
+        stage.warm()
+        if stage.available:
+            backends["hybrid+rerank"] = lambda i: [hit["title"] for hit in stage.rerank(
+                queries[i], hybrid(i, args.candidates), args.depth)]
+        else:
+            print("Cross-encoder could not be loaded, skipping the reranked backend")
+
+    print(f"{len(labeled)} labeled queries, {args.repeat} timed passes\n")
+    print(f"{'backend':<16} {'recall@' + str(args.k):>9} {'MRR':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, search in backends.items():
+        recalls, reciprocal_ranks = [], []
+        for i, item in enumerate(labeled):
+            recall, reciprocal_rank = evaluate(search(i), set(item["relevant"]), args.k)
+            recalls.append(recall)
+            reciprocal_ranks.append(reciprocal_rank)
+        timings = []
+        for _ in range(args.repeat):
+            for i in range(len(labeled)):
+                started = time.perf_counter()
+                search(i)
+                timings.append(time.perf_counter() - started)
+        print(f"{name:<16} {np.mean(recalls):9.3f} {np.mean(reciprocal_ranks):7.3f} {percentile_ms(timings, 50):8.3f} "
+              f"{percentile_ms(timings, 95):8.3f} {percentile_ms(timings, 99):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
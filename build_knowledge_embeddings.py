@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Precompute travel knowledge embeddings into a shipped artifact
+
+Writes knowledge/travel_knowledge_embeddings.npy (normalized vectors) and
+knowledge/travel_knowledge_embeddings.json (model id, ids, content hashes).
+Run it after editing knowledge/travel_knowledge.py, with the same backend and
+model the app uses for the knowledge collection, and commit both files.
+
+Usage:
+    python build_knowledge_embeddings.py
+    python build_knowledge_embeddings.py --backend local --dtype float16
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Load environment variables
+load_dotenv()
+
+from knowledge.travel_knowledge import travel_knowledge
+from services.embeddings import DiskVectorCache, create_embedding_function, backend_id, OPENAI_BACKEND, LOCAL_BACKEND
+from services.knowledge_artifact import write_knowledge_artifact, artifact_paths
+from services.knowledge_sync import knowledge_document
+
+DEFAULT_PREFIX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge", "travel_knowledge_embeddings")
+
+
+def main():
+    default_backend = os.getenv("KNOWLEDGE_EMBEDDING_BACKEND", os.getenv("EMBEDDING_BACKEND", OPENAI_BACKEND))
+    parser = argparse.ArgumentParser(description="Precompute travel knowledge embeddings")
+    parser.add_argument("--backend", choices=[OPENAI_BACKEND, LOCAL_BACKEND], default=default_backend)
+    parser.add_argument("--model", default=None, help="Model name (defaults to the configured or backend default)")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--output", default=DEFAULT_PREFIX, help="Output path prefix (.npy and .json are added)")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    model = args.model or os.getenv("LOCAL_EMBEDDING_MODEL" if args.backend == LOCAL_BACKEND else "OPENAI_EMBEDDING_MODEL")
+    disk_cache = DiskVectorCache(
+        os.getenv("EMBEDDING_DISK_CACHE_PATH", "./embedding_cache/vectors.sqlite3"),
+        max_entries=int(os.getenv("EMBEDDING_DISK_CACHE_MAX_ENTRIES", "100000"))
+    )
+    embedding_function = create_embedding_function(args.backend, model, disk_cache)
+    model_id = backend_id(args.backend, model)
+
+    print(f"🔄 Embedding {len(travel_knowledge)} knowledge entries with {model_id}...")
+    started = time.perf_counter()
+    documents = [knowledge_document(entry) for entry in travel_knowledge]
+    vectors = []
+    for start in range(0, len(documents), args.batch_size):
+        vectors.extend(embedding_function(documents[start:start + args.batch_size]))
+    write_knowledge_artifact(args.output, travel_knowledge, vectors, model_id, np.dtype(args.dtype))
+
+    matrix_path, manifest_path = artifact_paths(args.output)
+    print(f"✅ Wrote {matrix_path} ({os.path.getsize(matrix_path) / 1024:.1f} KiB) and {manifest_path} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,9 @@ import os
 import json
 import uuid
 import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
@@ -16,28 +19,45 @@ from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, Field
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, RateLimitError, InternalServerError
 from dotenv import load_dotenv
 import uvicorn
 import httpx
 import random
-import pandas as pd
-import openpyxl
 from io import BytesIO, StringIO
 import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
-import torch
-from transformers import VitsModel, AutoTokenizer
 import numpy as np
-import base64
-import soundfile as sf
-import tempfile
-import librosa
-from scipy.io import wavfile
 import warnings
 from knowledge.travel_knowledge import travel_knowledge
 from knowledge.user_mock_data import user_mock_data
+from services.singleflight import SingleFlight, make_key
+from services.resilience import CallPolicy, RetryBudget
+from services.tool_router import ToolSelector
+from services.cascade import ModelCascade, FULL_TIER
+from services.embeddings import (
+    CachedEmbedder, DiskVectorCache, create_embedding_function, backend_id,
+    OPENAI_BACKEND, LOCAL_BACKEND
+)
+from services.vector_index import VectorIndex
+from services.write_behind import WriteBehindQueue
+from services.knowledge_artifact import KnowledgeArtifact
+from services.knowledge_sync import sync_knowledge, sync_keyword_index
+from services.bm25 import BM25Index, fuse_hits
+from services.query_filters import KnowledgeFilter, build_filter_chain
+from services.conversation_store import ConversationStore, ConversationCompactor, RetentionPolicy
+from services.quantized_store import QuantizedClient
+from services.reranker import CrossEncoderReranker, RerankStage, DEFAULT_CROSS_ENCODER
+from services.retrieval_cache import RetrievalCache, make_key as retrieval_cache_key
+from services.speech import LocalSpeechSynthesizer, time_stretch, encode_wav_base64
+from services.exports import export_messages_to_excel, export_messages_to_txt
+from services.http_client import create_http_client, borrow_client
+from services.swr_cache import StaleWhileRevalidateCache
+from services.weather import fetch_forecast_series
+from services.fast_path import FastPathRouter, FastPathAnswer, TEMPLATE_RESPONSES
+from services.admission import (
+    AdmissionController, AdmissionRejected,
+    PRIORITY_INTERACTIVE, PRIORITY_REST
+)
 warnings.filterwarnings("ignore")
 
 # Load environment variables
@@ -60,167 +80,362 @@ os.makedirs("static", exist_ok=True)
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Text-to-Speech Setup
-tts_model = None
-tts_tokenizer = None
+# Text-to-Speech Setup (torch/transformers are imported when the model loads)
+speech_synthesizer = LocalSpeechSynthesizer()
 
 def initialize_tts():
     """Initialize TTS model (lazy loading)"""
-    global tts_model, tts_tokenizer
     try:
-        if tts_model is None:
-            print("🔊 Initializing Text-to-Speech model...")
-            tts_model = VitsModel.from_pretrained("facebook/mms-tts-eng")
-            tts_tokenizer = AutoTokenizer.from_pretrained("facebook/mms-tts-eng")
-            print("✅ TTS model initialized successfully")
+        speech_synthesizer.load()
     except Exception as e:
         print(f"❌ Error initializing TTS: {e}")
         print("TTS functionality will be disabled")
 
+# Without TTS_PRELOAD the model loads in a worker thread when audio is first needed
+tts_load_task: Optional[asyncio.Task] = None
+
+async def load_tts_in_background():
+    await asyncio.to_thread(initialize_tts)
+    await asyncio.to_thread(prewarm_fast_path_audio)
+
+def ensure_tts_loading() -> bool:
+    """Start loading the TTS model off the event loop if needed; True while a load is in progress"""
+    global tts_load_task
+    if speech_synthesizer.available:
+        return False
+    if tts_load_task is None and not speech_synthesizer.load_attempted:
+        tts_load_task = asyncio.get_running_loop().create_task(load_tts_in_background())
+    return tts_load_task is not None and not tts_load_task.done()
+
 def text_to_speech(text: str, max_length: int = 200, speed: float = 1.0) -> Optional[str]:
     """Convert text to speech and return base64 encoded audio with speed control"""
     try:
-        if tts_model is None or tts_tokenizer is None:
-            print("TTS model not initialized")
+        if not speech_synthesizer.available:
+            # No audio until the model is ready; loading never blocks the event loop
+            if not ensure_tts_loading():
+                print("TTS model not initialized")
             return None
         
         # Truncate text if too long
         if len(text) > max_length:
             text = text[:max_length] + "..."
         
-        # Tokenize and generate speech
-        inputs = tts_tokenizer(text, return_tensors="pt")
-        
-        with torch.no_grad():
-            output = tts_model(**inputs).waveform
-        
-        # Convert to numpy array and normalize
-        waveform = output.squeeze().cpu().numpy()
-        
-        # Apply speed adjustment if needed
-        if speed != 1.0:
-            # Clamp speed to reasonable range
-            speed = max(0.5, min(2.0, speed))
-            
-            # Use librosa for time stretching (speed adjustment)
-            waveform = librosa.effects.time_stretch(waveform, rate=speed)
-        
-        # Use BytesIO instead of temporary file to avoid file access issues
-        audio_buffer = BytesIO()
-        
-        # Write audio to buffer
-        sf.write(audio_buffer, waveform, 16000, format='WAV')
-        
-        # Get audio data from buffer
-        audio_buffer.seek(0)
-        audio_data = audio_buffer.read()
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-        
-        # Close buffer
-        audio_buffer.close()
-        
-        return audio_base64
+        return speech_synthesizer.synthesize(text, speed)
     
     except Exception as e:
         print(f"TTS Error: {e}")
         return None
 
+@lru_cache(maxsize=256)
+def cached_text_to_speech(text: str, speed: float = 1.0) -> Optional[str]:
+    """Text-to-speech for fixed responses, memoized by (text, speed)"""
+    return text_to_speech(text, max_length=200, speed=speed)
+
+def prewarm_fast_path_audio():
+    """Pre-synthesize audio for the fast-path template responses"""
+    if not speech_synthesizer.available:
+        return
+    for response in TEMPLATE_RESPONSES.values():
+        cached_text_to_speech(response, 1.0)
+    print(f"✅ Pre-synthesized audio for {len(TEMPLATE_RESPONSES)} fast-path responses")
+
 # OpenAI Client Setup
 client = OpenAI(
     base_url=os.getenv("OPENAI_BASE_URL", "https://aiportalapi.stu-platform.live/jpe"),
     api_key=os.getenv("OPENAI_API_KEY"),
+    # Retries are owned by llm_call_policy so they respect the shared retry budget
+    max_retries=0,
 )
 
 model_name = os.getenv("OPENAI_MODEL_NAME", "GPT-4o-mini")
 
-# ChromaDB Setup for Vector Storage
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
+# Model cascade: a small/fast model for routine turns, escalating to model_name when needed
+model_cascade = ModelCascade(
+    fast_model=os.getenv("OPENAI_FAST_MODEL_NAME"),
+    full_model=model_name,
+    fast_max_tokens=int(os.getenv("OPENAI_FAST_MAX_TOKENS", "800")),
+    full_max_tokens=int(os.getenv("OPENAI_MAX_TOKENS", "2000"))
+)
 
-# Initialize OpenAI embedding function for ChromaDB
-openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=os.getenv("OPENAI_API_KEY_EMBEDDING"),
-    model_name="text-embedding-3-small"
+# Request coalescing: identical concurrent calls share one upstream request
+tool_call_flight = SingleFlight("tool_calls")
+completion_flight = SingleFlight("completions")
+
+def is_stateless_request(messages: List[Dict[str, Any]]) -> bool:
+    """A request is stateless when it carries no prior assistant or tool turns"""
+    return all(msg.get("role") in ("system", "user") for msg in messages)
+
+# Admission control: global concurrency, rate buckets and priority queue for LLM calls
+llm_admission = AdmissionController(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+    tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "100")),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+)
+
+def estimate_request_tokens(kwargs: Dict[str, Any]) -> int:
+    """Rough token cost of a completion request (prompt chars / 4 plus completion budget)"""
+    prompt_chars = len(json.dumps(kwargs.get("messages", []), default=str))
+    prompt_chars += len(json.dumps(kwargs.get("functions", []), default=str))
+    return prompt_chars // 4 + kwargs.get("max_tokens", 0)
+
+# Deadlines, jittered retries under a global retry budget, and optional p95 hedging
+llm_call_policy = CallPolicy(
+    deadline=float(os.getenv("LLM_DEADLINE", "45")),
+    attempt_timeout=float(os.getenv("LLM_ATTEMPT_TIMEOUT", "20")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+    hedge=os.getenv("LLM_HEDGING", "false").lower() == "true",
+    retryable=(APIConnectionError, RateLimitError, InternalServerError, asyncio.TimeoutError),
+    retry_budget=RetryBudget(ratio=float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.1")))
 )
 
-# Create or get collections
-try:
-    user_conversations_collection = chroma_client.create_collection(
-        name="user_conversations",
-        embedding_function=openai_ef,
-        metadata={"description": "User conversation history and preferences"}
+async def chat_completion_attempt(timeout: float, ticket, **kwargs):
+    """Run one completion attempt in a worker thread; the caller already holds an admission slot"""
+    response = await asyncio.to_thread(client.chat.completions.create, timeout=timeout, **kwargs)
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "total_tokens", None) is not None:
+        ticket.actual_tokens = usage.total_tokens
+    return response
+
+async def resilient_chat_completion(priority: int, **kwargs):
+    """Run a completion under the deadline, retry and hedging policy, admitting each attempt first"""
+    estimated_tokens = estimate_request_tokens(kwargs)
+    return await llm_call_policy.run(
+        lambda timeout, ticket: chat_completion_attempt(timeout, ticket, **kwargs),
+        admit=lambda: llm_admission.slot(priority, estimated_tokens)
     )
-except Exception:
-    user_conversations_collection = chroma_client.get_collection(
-        name="user_conversations",
-        embedding_function=openai_ef
+
+async def create_chat_completion(priority: int = PRIORITY_REST, **kwargs):
+    """Run a chat completion off the event loop, coalescing identical stateless requests"""
+    if not is_stateless_request(kwargs.get("messages", [])):
+        return await resilient_chat_completion(priority, **kwargs)
+    
+    key = make_key(kwargs)
+    return await completion_flight.do(
+        key, lambda: resilient_chat_completion(priority, **kwargs)
     )
 
-try:
-    travel_knowledge_collection = chroma_client.create_collection(
-        name="travel_knowledge",
-        embedding_function=openai_ef,
-        metadata={"description": "Travel knowledge base and tips"}
+# ChromaDB Setup for Vector Storage
+chroma_client = chromadb.PersistentClient(path="./chroma_db")
+
+# Embedding backends, selectable per collection ("openai" or "local")
+default_embedding_backend = os.getenv("EMBEDDING_BACKEND", OPENAI_BACKEND)
+conversations_embedding_backend = os.getenv("CONVERSATIONS_EMBEDDING_BACKEND", default_embedding_backend)
+knowledge_embedding_backend = os.getenv("KNOWLEDGE_EMBEDDING_BACKEND", default_embedding_backend)
+
+# Persistent vectors for knowledge documents only; user messages and conversation turns never go to disk here
+embedding_disk_cache = None
+if os.getenv("EMBEDDING_DISK_CACHE", "true").lower() == "true":
+    embedding_disk_cache = DiskVectorCache(
+        os.getenv("EMBEDDING_DISK_CACHE_PATH", "./embedding_cache/vectors.sqlite3"),
+        max_entries=int(os.getenv("EMBEDDING_DISK_CACHE_MAX_ENTRIES", "100000"))
     )
-except Exception:
-    travel_knowledge_collection = chroma_client.get_collection(
-        name="travel_knowledge",
-        embedding_function=openai_ef
+
+def embedding_model_for(backend: str) -> Optional[str]:
+    """Configured model name for a backend (None means the backend default)"""
+    if backend == LOCAL_BACKEND:
+        return os.getenv("LOCAL_EMBEDDING_MODEL")
+    return os.getenv("OPENAI_EMBEDDING_MODEL")
+
+# One cached query embedder per backend, so each message is embedded once per backend per turn
+query_embedders: Dict[str, CachedEmbedder] = {}
+
+def get_query_embedder(backend: str) -> CachedEmbedder:
+    if backend not in query_embedders:
+        query_embedders[backend] = CachedEmbedder(
+            create_embedding_function(backend, embedding_model_for(backend)),
+            max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+        )
+    return query_embedders[backend]
+
+conversation_embedder = get_query_embedder(conversations_embedding_backend)
+knowledge_embedder = get_query_embedder(knowledge_embedding_backend)
+knowledge_document_embedding_function = create_embedding_function(
+    knowledge_embedding_backend, embedding_model_for(knowledge_embedding_backend), embedding_disk_cache
+)
+
+def get_or_create_collection(name: str, backend: str, description: str, embedding_function: Any = None):
+    """Open a collection with its backend's embedding function, warning if it was built with another model"""
+    embedding_function = embedding_function or get_query_embedder(backend).embedding_function
+    expected_backend = backend_id(backend, embedding_model_for(backend))
+    try:
+        collection = chroma_client.create_collection(
+            name=name,
+            embedding_function=embedding_function,
+            metadata={"description": description, "embedding_backend": expected_backend}
+        )
+    except Exception:
+        collection = chroma_client.get_collection(
+            name=name,
+            embedding_function=embedding_function
+        )
+    
+    # Collections created before backends were configurable hold OpenAI vectors
+    stored_backend = (collection.metadata or {}).get("embedding_backend", backend_id(OPENAI_BACKEND))
+    if stored_backend != expected_backend:
+        print(f"⚠️ Collection '{name}' was embedded with {stored_backend} but {expected_backend} is configured. "
+              f"Run: python migrate_embeddings.py {name} --backend {backend}")
+    return collection
+
+# Conversation memory lives in ChromaDB, or in a local quantized store (int8/float16 codes in
+# memory, full-precision vectors on disk for re-scoring the top candidates)
+conversation_memory_client: Optional[QuantizedClient] = None
+if os.getenv("CONVERSATION_MEMORY_BACKEND", "chroma") == "quantized":
+    conversation_memory_client = QuantizedClient(
+        os.getenv("QUANTIZED_MEMORY_PATH", "./conversation_memory/vectors.sqlite3"),
+        code_dtype=os.getenv("QUANTIZED_MEMORY_DTYPE", "int8"),
+        rescore=os.getenv("QUANTIZED_MEMORY_RESCORE", "float32"),
+        rescore_candidates=int(os.getenv("QUANTIZED_MEMORY_RESCORE_CANDIDATES", "4"))
     )
 
+# Create or get collections; conversation turns are routed by the configured layout
+# (one collection, monthly buckets, or shards by conversation id)
+conversation_store = ConversationStore(
+    conversation_memory_client or chroma_client,
+    "user_conversations",
+    conversation_memory_client.get_or_create_collection if conversation_memory_client else
+    lambda name: get_or_create_collection(name, conversations_embedding_backend, "User conversation history and preferences"),
+    conversation_embedder.embedding_function,
+    layout=os.getenv("CONVERSATION_LAYOUT", "single"),
+    shards=int(os.getenv("CONVERSATION_SHARDS", "8")),
+    query_buckets=int(os.getenv("CONVERSATION_QUERY_BUCKETS", "2"))
+)
+travel_knowledge_collection = get_or_create_collection(
+    "travel_knowledge", knowledge_embedding_backend, "Travel knowledge base and tips",
+    knowledge_document_embedding_function
+)
+
+# Precomputed knowledge embeddings shipped with the code (see build_knowledge_embeddings.py)
+knowledge_artifact: Optional[KnowledgeArtifact] = None
+
+def load_knowledge_artifact():
+    """Memory-map the shipped knowledge embeddings if they were built with the configured model"""
+    global knowledge_artifact
+    try:
+        artifact = KnowledgeArtifact.load(
+            os.getenv("KNOWLEDGE_EMBEDDINGS_ARTIFACT", "./knowledge/travel_knowledge_embeddings"),
+            model_id=backend_id(knowledge_embedding_backend, embedding_model_for(knowledge_embedding_backend))
+        )
+    except Exception as e:
+        print(f"Error loading precomputed knowledge embeddings: {e}")
+        return
+    if artifact is None:
+        return
+    knowledge_artifact = artifact
+    print(f"✅ Loaded precomputed embeddings for {len(artifact.current_rows(travel_knowledge))}/{len(travel_knowledge)} knowledge entries")
+
 # Initialize Travel Knowledge Base
 async def initialize_travel_knowledge():
-    """Initialize the travel knowledge base with predefined data"""
+    """Sync the travel knowledge base into ChromaDB, embedding only new or edited entries"""
     try:
-        # Check if knowledge base is already populated
-        existing_count = travel_knowledge_collection.count()
-        if existing_count > 0:
-            print(f"Travel knowledge base already contains {existing_count} entries")
-            return
-        
-        # Add travel knowledge to ChromaDB
-        documents = []
-        metadatas = []
-        ids = []
-        
-        for i, knowledge in enumerate(travel_knowledge):
-            doc_id = f"knowledge_{i}"
-            documents.append(f"{knowledge['title']}: {knowledge['content']}")
-            metadatas.append({
-                "title": knowledge['title'],
-                "category": knowledge['category'],
-                "tags": ",".join(knowledge['tags'])
-            })
-            ids.append(doc_id)
-        
-        # Add to ChromaDB in batches
-        batch_size = 100
-        for i in range(0, len(documents), batch_size):
-            batch_docs = documents[i:i+batch_size]
-            batch_metas = metadatas[i:i+batch_size]
-            batch_ids = ids[i:i+batch_size]
-            
-            travel_knowledge_collection.add(
-                documents=batch_docs,
-                metadatas=batch_metas,
-                ids=batch_ids
-            )
-        
-        print(f"Successfully initialized travel knowledge base with {len(documents)} entries")
+        # Shipped vectors cover unchanged entries, so a fresh node makes no embedding calls
+        embedding_function = knowledge_document_embedding_function
+        if knowledge_artifact is not None:
+            embedding_function = knowledge_artifact.embedding_function(travel_knowledge, embedding_function)
+        result = await asyncio.to_thread(
+            sync_knowledge,
+            travel_knowledge_collection,
+            travel_knowledge,
+            embedding_function,
+            int(os.getenv("KNOWLEDGE_SYNC_BATCH_SIZE", "100")),
+            lambda _: knowledge_result_cache.invalidate()
+        )
+        keyword_result = sync_keyword_index(knowledge_keyword_index, travel_knowledge)
+        if keyword_result.changed:
+            knowledge_result_cache.invalidate()
+            print(f"Synced knowledge keyword index: {keyword_result}")
+        if result.changed:
+            print(f"Synced travel knowledge base: {result}")
+        else:
+            print(f"Travel knowledge base is up to date ({result.unchanged} entries)")
         
     except Exception as e:
         print(f"Error initializing travel knowledge base: {e}")
 
+# Keyword index over the knowledge base for hybrid retrieval; built from the module
+# data at import, so it works before (or without) any embeddings
+hybrid_search_enabled = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+hybrid_candidates = int(os.getenv("HYBRID_SEARCH_CANDIDATES", "10"))
+knowledge_keyword_index = BM25Index()
+sync_keyword_index(knowledge_keyword_index, travel_knowledge)
+
+# Region/category prefiltering for knowledge retrieval
+knowledge_filter_min_results = int(os.getenv("KNOWLEDGE_FILTER_MIN_RESULTS", "2"))
+knowledge_filter_stats = {"region_category": 0, "filtered": 0, "global": 0}
+
+# Knowledge retrieval results by normalized query + filters; cleared whenever the corpus changes
+knowledge_result_cache = RetrievalCache(
+    max_entries=int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "2048")),
+    ttl=float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "600"))
+)
+
+# Optional second stage: rerank a wider candidate set with a local cross-encoder and keep
+# the passages that fit the context token budget, skipped when the latency budget is spent
+knowledge_reranker = RerankStage(
+    CrossEncoderReranker(os.getenv("RERANK_MODEL", DEFAULT_CROSS_ENCODER)),
+    enabled=os.getenv("RERANK_ENABLED", "false").lower() == "true",
+    candidates=int(os.getenv("RERANK_CANDIDATES", "20")),
+    budget_seconds=float(os.getenv("RERANK_BUDGET_MS", "150")) / 1000,
+    max_context_tokens=int(os.getenv("RERANK_MAX_CONTEXT_TOKENS", "400"))
+)
+
+# In-memory copy of the knowledge embeddings; answers top-k without touching ChromaDB
+knowledge_index: Optional[VectorIndex] = None
+
+def load_knowledge_index():
+    """Load the knowledge collection's embeddings into a contiguous NumPy matrix"""
+    global knowledge_index
+    if os.getenv("KNOWLEDGE_INDEX_ENABLED", "true").lower() != "true":
+        return
+    try:
+        dtype = np.float16 if os.getenv("KNOWLEDGE_INDEX_DTYPE", "float32") == "float16" else np.float32
+        if knowledge_artifact is not None and knowledge_artifact.covers(travel_knowledge):
+            # Straight from the memory-mapped artifact, without reading the collection back
+            index = knowledge_artifact.index(travel_knowledge, dtype=dtype)
+            source = "precomputed artifact"
+        else:
+            index = VectorIndex.from_collection(travel_knowledge_collection, dtype=dtype)
+            source = "ChromaDB"
+        knowledge_index = index if len(index) else None
+        knowledge_result_cache.invalidate()
+        print(f"✅ Loaded {len(index)} knowledge vectors into memory from {source} ({index.nbytes / 1024:.1f} KiB)")
+    except Exception as e:
+        print(f"Error loading in-memory knowledge index, using ChromaDB queries: {e}")
+        knowledge_index = None
+
 # Initialize knowledge base on startup
 async def startup_initialization():
     """Initialize the application on startup"""
-    initialize_tts()
+    global tool_http_client
+    tool_http_client = create_tool_http_client()
+    if os.getenv("TTS_PRELOAD", "true").lower() == "true":
+        await asyncio.to_thread(initialize_tts)
+        prewarm_fast_path_audio()
+    load_knowledge_artifact()
     await initialize_travel_knowledge()
+    load_knowledge_index()
+    await asyncio.to_thread(knowledge_reranker.warm)
+    conversation_writer.start()
+    if conversation_retention.enabled:
+        print(f"🗂️ Conversation retention enabled ({conversation_retention.mode}): "
+              f"max age {conversation_retention.max_age_days:g} days, max turns {conversation_retention.max_turns}")
+        conversation_compactor.start()
 
 # Initialize knowledge base on startup when the app starts
 @app.on_event("startup")
 async def on_startup():
     await startup_initialization()
 
+# Flush queued conversation writes before the process exits
+@app.on_event("shutdown")
+async def on_shutdown():
+    await conversation_compactor.close()
+    await conversation_writer.close()
+    await weather_cache.close()
+    if tool_http_client is not None:
+        await tool_http_client.aclose()
+
 # In-memory storage for active conversations
 conversations: Dict[str, List[Dict]] = {}
 
@@ -272,66 +487,65 @@ class TTSRequest(BaseModel):
     speed: float = Field(1.0, description="Speech speed multiplier (0.5-2.0, default: 1.0)")
     max_length: int = Field(200, description="Maximum text length (default: 200)")
 
+# Shared, pooled HTTP client for external tool calls; created at startup, closed at shutdown
+tool_http_client: Optional[httpx.AsyncClient] = None
+weather_api_base_url = os.getenv("WEATHER_API_BASE_URL", "http://api.openweathermap.org/data/2.5")
+
+def create_tool_http_client() -> httpx.AsyncClient:
+    return create_http_client(
+        timeout=float(os.getenv("TOOL_HTTP_TIMEOUT", "10")),
+        connect_timeout=float(os.getenv("TOOL_HTTP_CONNECT_TIMEOUT", "3")),
+        max_connections=int(os.getenv("TOOL_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("TOOL_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("TOOL_HTTP_KEEPALIVE_EXPIRY", "30")),
+        http2=os.getenv("TOOL_HTTP2", "false").lower() == "true"
+    )
+
+# Both weather tools are served from one cached forecast series per (city, country, units);
+# expired entries are served while they refresh
+weather_cache = StaleWhileRevalidateCache(
+    "weather",
+    max_entries=int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "1024")),
+    stale_ttl=float(os.getenv("WEATHER_STALE_TTL_SECONDS", "3600")),
+    negative_ttl=float(os.getenv("WEATHER_NEGATIVE_TTL_SECONDS", "60"))
+)
+weather_series_ttl = float(os.getenv("WEATHER_SERIES_TTL_SECONDS", "1800"))
+
+def weather_cache_key(city: str, country: str) -> tuple:
+    return ("forecast_series", city.strip().casefold(), country.strip().casefold(), "metric")
+
+async def get_forecast_series(city: str, country: str = "", http_client: Optional[httpx.AsyncClient] = None) -> Any:
+    """Cached ForecastSeries for a city, or an {"error": ...} dict"""
+    async def fetch():
+        try:
+            api_key = os.getenv("WEATHER_API_KEY")
+            if not api_key:
+                return {"error": "Weather API key not configured"}
+            async with borrow_client(http_client) as client:
+                return await fetch_forecast_series(client, weather_api_base_url, api_key, city, country)
+        except Exception as e:
+            return {"error": f"Error fetching weather: {str(e)}"}
+
+    return await weather_cache.get_or_fetch(weather_cache_key(city, country), fetch, weather_series_ttl)
+
 # Weather API Functions
-async def get_weather(city: str, country: str = "") -> Dict[str, Any]:
+async def get_weather(city: str, country: str = "", http_client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
     """Get current weather information for a city"""
-    try:
-        api_key = os.getenv("WEATHER_API_KEY")
-        if not api_key:
-            return {"error": "Weather API key not configured"}
-        
-        query = f"{city},{country}" if country else city
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={query}&appid={api_key}&units=metric"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "city": data["name"],
-                    "country": data["sys"]["country"],
-                    "temperature": data["main"]["temp"],
-                    "feels_like": data["main"]["feels_like"],
-                    "humidity": data["main"]["humidity"],
-                    "description": data["weather"][0]["description"],
-                    "wind_speed": data["wind"]["speed"]
-                }
-            else:
-                return {"error": f"Weather data not found for {city}"}
-    except Exception as e:
-        return {"error": f"Error fetching weather: {str(e)}"}
+    series = await get_forecast_series(city, country, http_client)
+    if isinstance(series, dict):
+        return series
+    return series.current()
 
-async def get_forecast(city: str, country: str = "", days: int = 5) -> Dict[str, Any]:
+async def get_forecast(city: str, country: str = "", days: int = 5, http_client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
     """Get weather forecast for a city"""
-    try:
-        api_key = os.getenv("WEATHER_API_KEY")
-        if not api_key:
-            return {"error": "Weather API key not configured"}
-        
-        query = f"{city},{country}" if country else city
-        url = f"http://api.openweathermap.org/data/2.5/forecast?q={query}&appid={api_key}&units=metric&cnt={days*8}"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                forecasts = []
-                for item in data["list"][::8]:  # Every 8th item (24 hours)
-                    forecasts.append({
-                        "date": item["dt_txt"].split(" ")[0],
-                        "temperature": item["main"]["temp"],
-                        "description": item["weather"][0]["description"],
-                        "humidity": item["main"]["humidity"]
-                    })
-                return {
-                    "city": data["city"]["name"],
-                    "country": data["city"]["country"],
-                    "forecasts": forecasts
-                }
-            else:
-                return {"error": f"Forecast data not found for {city}"}
-    except Exception as e:
-        return {"error": f"Error fetching forecast: {str(e)}"}
+    series = await get_forecast_series(city, country, http_client)
+    if isinstance(series, dict):
+        return series
+    return {
+        "city": series.city,
+        "country": series.country,
+        "forecasts": series.daily(max(1, min(int(days), 5)))
+    }
 
 # Travel Information Functions
 async def search_flights(origin: str, destination: str, departure_date: str, return_date: str = None) -> Dict[str, Any]:
@@ -483,73 +697,228 @@ async def get_travel_tips(destination: str) -> Dict[str, Any]:
         return {"error": f"Error getting travel tips: {str(e)}"}
 
 # Helper functions for ChromaDB integration
-def get_relevant_conversation_history(query: str, conversation_id: str, limit: int = 3) -> List[Dict]:
+def get_relevant_conversation_history(query: str, conversation_id: str, limit: int = 3, query_embedding: Optional[Any] = None) -> List[Dict]:
     """Get relevant conversation history using vector search"""
     try:
-        # Search for relevant conversations
-        results = user_conversations_collection.query(
-            query_texts=[query],
-            n_results=limit,
-            where={"conversation_id": conversation_id}
-        )
+        if query_embedding is None:
+            query_embedding = conversation_embedder.embed_one(query)
         
-        relevant_history = []
-        if results['documents']:
-            for i, doc in enumerate(results['documents'][0]):
-                relevant_history.append({
-                    "content": doc,
-                    "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
-                    "distance": results['distances'][0][i] if results['distances'] else 0
-                })
-        
-        return relevant_history
+        # Search for relevant conversations
+        return conversation_store.query(query_embedding, conversation_id, limit)
     except Exception as e:
         print(f"Error getting relevant conversation history: {e}")
         return []
 
-def get_relevant_travel_knowledge(query: str, limit: int = 3) -> List[Dict]:
-    """Get relevant travel knowledge using vector search"""
+def vector_knowledge_hits(query_embedding: Any, limit: int, knowledge_filter: Optional[KnowledgeFilter] = None) -> List[Dict]:
+    """Top knowledge entries by vector similarity, from the in-memory index or ChromaDB"""
+    # Serve from the in-memory index (or its precomputed partition) when it is loaded
+    if knowledge_index is not None:
+        return [
+            {
+                "id": hit["id"],
+                "title": hit["metadata"].get('title', 'Travel Tip'),
+                "content": hit["document"],
+                "category": hit["metadata"].get('category', 'General'),
+                "region": hit["metadata"].get('region', 'global'),
+                "tags": hit["metadata"].get('tags', '').split(',') if hit["metadata"].get('tags') else [],
+                "distance": hit["distance"]
+            }
+            for hit in knowledge_index.search(query_embedding, k=limit, metadata_filter=knowledge_filter)
+        ]
+    
+    # Search for relevant travel knowledge
+    query_args = {"query_embeddings": [query_embedding], "n_results": limit}
+    where = knowledge_filter.to_where() if knowledge_filter is not None else None
+    if where:
+        query_args["where"] = where
+    results = travel_knowledge_collection.query(**query_args)
+    
+    relevant_knowledge = []
+    if results['documents']:
+        for i, doc in enumerate(results['documents'][0]):
+            metadata = results['metadatas'][0][i] if results['metadatas'] else {}
+            relevant_knowledge.append({
+                "id": results['ids'][0][i],
+                "title": metadata.get('title', 'Travel Tip'),
+                "content": doc,
+                "category": metadata.get('category', 'General'),
+                "region": metadata.get('region', 'global'),
+                "tags": metadata.get('tags', '').split(',') if metadata.get('tags') else [],
+                "distance": results['distances'][0][i] if results['distances'] else 0
+            })
+    return relevant_knowledge
+
+def search_travel_knowledge(query: str, limit: int, query_embedding: Optional[Any], knowledge_filter: Optional[KnowledgeFilter] = None) -> List[Dict]:
+    """One retrieval pass: vector hits, fused with BM25 hits when hybrid search is on"""
+    candidates = max(limit, hybrid_candidates) if hybrid_search_enabled else limit
+    vector_hits = vector_knowledge_hits(query_embedding, candidates, knowledge_filter) if query_embedding is not None else []
+    if not hybrid_search_enabled:
+        return vector_hits[:limit]
+    
+    # Fuse keyword and vector rankings; keyword-only hits carry the maximum distance
+    keyword_hits = knowledge_keyword_index.search(query, k=len(knowledge_keyword_index))
+    if knowledge_filter is not None:
+        keyword_hits = [hit for hit in keyword_hits if knowledge_filter.matches(hit["payload"])]
+    return fuse_hits(vector_hits, keyword_hits[:candidates], limit)
+
+def get_relevant_travel_knowledge(query: str, limit: int = 3, query_embedding: Optional[Any] = None, use_vectors: bool = True, knowledge_filters: Optional[List[KnowledgeFilter]] = None) -> List[Dict]:
+    """Get relevant travel knowledge using hybrid BM25 + vector search.
+
+    Filters are tried narrowest first; a stage returning fewer than
+    knowledge_filter_min_results hits falls through to the next, ending with a
+    global search.
+    """
     try:
-        # Search for relevant travel knowledge
-        results = travel_knowledge_collection.query(
-            query_texts=[query],
-            n_results=limit
-        )
-        
-        relevant_knowledge = []
-        if results['documents']:
-            for i, doc in enumerate(results['documents'][0]):
-                metadata = results['metadatas'][0][i] if results['metadatas'] else {}
-                relevant_knowledge.append({
-                    "title": metadata.get('title', 'Travel Tip'),
-                    "content": doc,
-                    "category": metadata.get('category', 'General'),
-                    "tags": metadata.get('tags', '').split(',') if metadata.get('tags') else [],
-                    "distance": results['distances'][0][i] if results['distances'] else 0
-                })
-        
-        return relevant_knowledge
+        if use_vectors and query_embedding is None:
+            try:
+                query_embedding = knowledge_embedder.embed_one(query)
+            except Exception as e:
+                if not hybrid_search_enabled:
+                    raise
+                print(f"Vector knowledge search unavailable, using keyword search only: {e}")
+        if not use_vectors:
+            query_embedding = None
+        
+        for knowledge_filter in list(knowledge_filters or []) + [None]:
+            hits = search_travel_knowledge(query, limit, query_embedding, knowledge_filter)
+            if knowledge_filter is None or len(hits) >= min(limit, knowledge_filter_min_results):
+                stage = "global" if knowledge_filter is None else ("region_category" if knowledge_filter.category and knowledge_filter.regions else "filtered")
+                knowledge_filter_stats[stage] += 1
+                return hits
+        return []
     except Exception as e:
         print(f"Error getting relevant travel knowledge: {e}")
         return []
 
+# Bounded pool for blocking ChromaDB queries, so retrieval never runs on the event loop
+retrieval_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RETRIEVAL_WORKERS", "8")), thread_name_prefix="retrieval"
+)
+retrieval_timeout = float(os.getenv("RETRIEVAL_TIMEOUT", "2.0"))
+retrieval_stats = {"turns": 0, "history_timeouts": 0, "knowledge_timeouts": 0, "errors": 0}
+
+async def retrieve_context(message: str, conversation_id: str, personalized: bool = False) -> tuple[List[Dict], List[Dict]]:
+    """Run history and knowledge retrieval concurrently; a slow or failing store yields no context"""
+    loop = asyncio.get_running_loop()
+    retrieval_stats["turns"] += 1
+    
+    # Narrow knowledge search to the destination's region (and topic) when we can tell
+    knowledge_filters = build_filter_chain(message, user_mock_data if personalized else None)
+    
+    # The message is embedded once per backend; both retrievals wait on the same task
+    embedding_tasks: Dict[int, asyncio.Future] = {}
+    
+    def embedding_for(embedder: CachedEmbedder) -> asyncio.Future:
+        if id(embedder) not in embedding_tasks:
+            task = asyncio.ensure_future(embedder.aembed_one(message))
+            # A timed-out retrieval may never await its embedding; don't log its failure as unhandled
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            embedding_tasks[id(embedder)] = task
+        return embedding_tasks[id(embedder)]
+    
+    async def history() -> List[Dict]:
+        query_embedding = await asyncio.shield(embedding_for(conversation_embedder))
+        return await loop.run_in_executor(
+            retrieval_executor, get_relevant_conversation_history, message, conversation_id, 2, query_embedding
+        )
+    
+    async def knowledge() -> List[Dict]:
+        # Hot queries are answered before embedding or searching anything; with reranking on,
+        # the cache holds the wider candidate set and only the (score-cached) rerank reruns
+        candidates = knowledge_reranker.retrieval_limit(3)
+        cache_key = retrieval_cache_key(message, knowledge_filters, candidates)
+        cached = knowledge_result_cache.get(cache_key)
+        if cached is not None:
+            return await rerank([dict(hit) for hit in cached])
+        generation = knowledge_result_cache.generation
+        
+        use_vectors = True
+        try:
+            query_embedding = await asyncio.shield(embedding_for(knowledge_embedder))
+        except Exception as e:
+            if not hybrid_search_enabled:
+                raise
+            # Keyword search still works without an embedding
+            print(f"Knowledge query embedding failed, using keyword search only: {e}")
+            query_embedding, use_vectors = None, False
+        hits = await loop.run_in_executor(
+            retrieval_executor, get_relevant_travel_knowledge, message, candidates, query_embedding, use_vectors, knowledge_filters
+        )
+        # Keyword-only fallbacks and empty results (possibly from an error) are not worth keeping
+        if hits and use_vectors:
+            knowledge_result_cache.put(cache_key, [dict(hit) for hit in hits], generation)
+        return await rerank(hits)
+    
+    async def rerank(hits: List[Dict]) -> List[Dict]:
+        if len(hits) <= 3:
+            return hits
+        return await loop.run_in_executor(retrieval_executor, knowledge_reranker.rerank, message, hits, 3)
+    
+    async def bounded(name: str, retrieval) -> List[Dict]:
+        try:
+            return await asyncio.wait_for(retrieval(), timeout=retrieval_timeout)
+        except asyncio.TimeoutError:
+            retrieval_stats[f"{name}_timeouts"] += 1
+            print(f"{name.capitalize()} retrieval exceeded {retrieval_timeout}s, continuing without it")
+        except Exception as e:
+            retrieval_stats["errors"] += 1
+            print(f"Error during {name} retrieval: {e}")
+        return []
+    
+    relevant_history, relevant_knowledge = await asyncio.gather(
+        bounded("history", history), bounded("knowledge", knowledge)
+    )
+    return relevant_history, relevant_knowledge
+
+def conversation_record(conversation_id: str, user_message: str, assistant_response: str) -> Dict[str, Any]:
+    """Build the ChromaDB record for one conversation turn"""
+    # Create a document combining user message and assistant response
+    now = datetime.now()
+    return {
+        "id": f"{conversation_id}_{now.timestamp()}",
+        "document": f"User: {user_message}\nAssistant: {assistant_response}",
+        "metadata": {
+            "conversation_id": conversation_id,
+            "timestamp": now.isoformat(),
+            "ts": now.timestamp(),
+            "user_message": user_message,
+            "assistant_response": assistant_response
+        }
+    }
+
+def write_conversation_batch(records: List[Dict[str, Any]]):
+    """Embed a batch of conversation turns in one call and write them with one upsert per collection"""
+    conversation_store.upsert(records)
+
+# Conversation turns are written behind the request path, batched by size and time
+conversation_writer = WriteBehindQueue(
+    write_conversation_batch,
+    max_batch=int(os.getenv("CONVERSATION_WRITE_BATCH_SIZE", "32")),
+    max_delay=float(os.getenv("CONVERSATION_WRITE_MAX_DELAY", "1.0")),
+    executor=retrieval_executor
+)
+
+# Retention for stored turns, enforced by a background compactor; off unless a limit is configured
+conversation_retention = RetentionPolicy(
+    max_age_days=float(os.getenv("CONVERSATION_RETENTION_DAYS", "0")),
+    max_turns=int(os.getenv("CONVERSATION_MAX_TURNS", "0")),
+    mode=os.getenv("CONVERSATION_COMPACTION_MODE", "merge")
+)
+conversation_compactor = ConversationCompactor(
+    lambda: conversation_store.compact(conversation_retention),
+    interval=float(os.getenv("CONVERSATION_COMPACTION_INTERVAL_SECONDS", "3600")),
+    executor=retrieval_executor
+)
+
 def store_conversation(conversation_id: str, user_message: str, assistant_response: str):
     """Store conversation in ChromaDB for future reference"""
+    record = conversation_record(conversation_id, user_message, assistant_response)
+    if conversation_writer.enqueue(record):
+        return
+    
+    # Writer not running (e.g. scripts without app startup) or queue full: write directly
     try:
-        # Create a document combining user message and assistant response
-        document = f"User: {user_message}\nAssistant: {assistant_response}"
-        
-        # Add to ChromaDB
-        user_conversations_collection.add(
-            documents=[document],
-            metadatas=[{
-                "conversation_id": conversation_id,
-                "timestamp": datetime.now().isoformat(),
-                "user_message": user_message,
-                "assistant_response": assistant_response
-            }],
-            ids=[f"{conversation_id}_{datetime.now().timestamp()}"]
-        )
+        write_conversation_batch([record])
     except Exception as e:
         print(f"Error storing conversation: {e}")
 
@@ -591,30 +960,12 @@ def generate_speech_vits(text: str, speech_speed: float = 1.0) -> Optional[str]:
         t = np.linspace(0, duration, int(sample_rate * duration), False)
         audio = np.sin(2 * np.pi * frequency * t) * 0.3
         
-        # Adjust speed by resampling using librosa
-        if speech_speed != 1.0:
-            # Clamp speed to reasonable range
-            speech_speed = max(0.5, min(2.0, speech_speed))
-            
-            # Use librosa for time stretching (speed adjustment)
-            audio = librosa.effects.time_stretch(audio, rate=speech_speed)
+        # Adjust speed (time stretching keeps the pitch)
+        audio = time_stretch(audio, speech_speed)
         
-        # Convert to 16-bit PCM
+        # Convert to 16-bit PCM and encode as WAV in memory
         audio_16bit = (audio * 32767).astype(np.int16)
-        
-        # Use soundfile to write to BytesIO buffer instead of wavfile
-        audio_buffer = BytesIO()
-        sf.write(audio_buffer, audio_16bit, sample_rate, format='WAV')
-        
-        # Get audio data from buffer
-        audio_buffer.seek(0)
-        audio_data = audio_buffer.read()
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-        
-        # Close buffer
-        audio_buffer.close()
-        
-        return audio_base64
+        return encode_wav_base64(audio_16bit, sample_rate)
     except Exception as e:
         print(f"Error generating speech with VITS: {e}")
         return None
@@ -699,14 +1050,41 @@ function_definitions = [
     }
 ]
 
+async def cascade_chat_completion(tier: str, priority: int, **kwargs):
+    """Run a completion on a cascade tier, escalating to the full model if the answer looks weak"""
+    model_tier = model_cascade.tiers[tier]
+    started = time.perf_counter()
+    response = await create_chat_completion(
+        priority=priority, model=model_tier.model, max_tokens=model_tier.max_tokens, **kwargs
+    )
+    model_cascade.record(tier, time.perf_counter() - started, response)
+    
+    if model_cascade.escalation_reason(tier, response):
+        return await cascade_chat_completion(FULL_TIER, priority, **kwargs)
+    return response, tier
+
+# Per-turn tool-schema selection (schema sizes are computed once here). With a stable
+# prefix, any tool-using turn sends the full schema list so the prompt cache still hits.
+tool_selector = ToolSelector(
+    function_definitions,
+    stable_prefix=os.getenv("PROMPT_CACHE_STABLE_TOOLS", "true").lower() == "true"
+)
+
 # Function call handler
 async def handle_function_call(function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-    """Handle function calls from OpenAI"""
+    """Handle function calls from OpenAI, sharing identical in-flight calls"""
+    key = make_key(function_name, arguments)
+    return await tool_call_flight.do(key, lambda: dispatch_function_call(function_name, arguments))
+
+async def dispatch_function_call(function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Dispatch a function call to its implementation"""
     try:
         if function_name == "get_weather":
-            return await get_weather(arguments["city"], arguments.get("country", ""))
+            return await get_weather(arguments["city"], arguments.get("country", ""), http_client=tool_http_client)
         elif function_name == "get_forecast":
-            return await get_forecast(arguments["city"], arguments.get("country", ""), arguments.get("days", 5))
+            return await get_forecast(
+                arguments["city"], arguments.get("country", ""), arguments.get("days", 5), http_client=tool_http_client
+            )
         elif function_name == "search_flights":
             return await search_flights(
                 arguments["origin"],
@@ -730,6 +1108,68 @@ async def handle_function_call(function_name: str, arguments: Dict[str, Any]) ->
     except Exception as e:
         return {"error": f"Error executing function {function_name}: {str(e)}"}
 
+# Message assembly for provider-side prompt caching: the system prompt and tool
+# schemas form a byte-identical prefix, history only ever grows by appending, and
+# everything that changes per turn (retrieved context) sits at the end.
+API_MESSAGE_KEYS = ("role", "content", "name", "function_call")
+MAX_HISTORY_MESSAGES = 20
+TRIMMED_HISTORY_MESSAGES = 10
+
+def to_api_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip local-only keys (timestamps) so identical turns serialize identically"""
+    return {key: msg[key] for key in API_MESSAGE_KEYS if key in msg}
+
+def build_request_messages(conversation_id: str, user_index: int, enhanced_context: str) -> List[Dict[str, Any]]:
+    """Assemble request messages: stable history prefix, then this turn's context and messages"""
+    history = conversations[conversation_id]
+    messages = [to_api_message(msg) for msg in history[:user_index]]
+    if enhanced_context:
+        messages.append({
+            "role": "system",
+            "content": f"Context from your knowledge base and previous conversations:{enhanced_context}"
+        })
+    messages.extend(to_api_message(msg) for msg in history[user_index:])
+    return messages
+
+def trim_conversation(conversation_id: str):
+    """Trim history in large steps so the cached prefix survives several turns"""
+    history = conversations[conversation_id]
+    if len(history) <= MAX_HISTORY_MESSAGES:
+        return
+    
+    # Keep the system message and restart the window at a user turn
+    recent = history[-TRIMMED_HISTORY_MESSAGES:]
+    while recent and recent[0].get("role") != "user":
+        recent = recent[1:]
+    conversations[conversation_id] = [history[0]] + recent
+
+# Local fast path for greetings, thanks, capability questions and close knowledge hits
+fast_path_router = FastPathRouter(
+    enabled=os.getenv("FAST_PATH_ENABLED", "true").lower() == "true",
+    max_knowledge_distance=float(os.getenv("FAST_PATH_MAX_KNOWLEDGE_DISTANCE", "0.35"))
+)
+
+def complete_fast_path_turn(conversation_id: str, message: str, answer: FastPathAnswer, speech_speed: float, turn_started: float) -> tuple[str, List[Dict], Optional[str]]:
+    """Record a locally answered turn in the conversation and attach cached audio"""
+    conversations[conversation_id].append({
+        "role": "user",
+        "content": message,
+        "timestamp": datetime.now().isoformat()
+    })
+    conversations[conversation_id].append({
+        "role": "assistant",
+        "content": answer.response,
+        "timestamp": datetime.now().isoformat()
+    })
+    
+    # Only memoize real audio, not the None returned while the model is still loading
+    audio_base64 = (
+        cached_text_to_speech(answer.response, speech_speed) if speech_synthesizer.available
+        else text_to_speech(answer.response, speed=speech_speed)
+    )
+    fast_path_router.record(answer.intent, time.perf_counter() - turn_started)
+    return answer.response, [], audio_base64
+
 def get_system_prompt() -> str:
     """Get the system prompt for the travel assistant"""
     return f"""You are TravelBot, an expert AI travel assistant with access to real-time data and comprehensive travel knowledge. You help users plan trips, find accommodations, search flights, check weather, discover attractions, and provide personalized travel advice.
@@ -780,7 +1220,7 @@ When personalization is enabled, you have access to the user's:
 
 Remember: Always use the available functions to get real-time data, leverage conversation history for personalization, and access the travel knowledge base for expert insights. When users ask about travel plans, proactively gather all relevant information they might need and offer audio summaries for key recommendations."""
 
-async def process_chat_message(message: str, conversation_id: str, personalized: bool = False, speech_speed: float = 1.0) -> tuple[str, List[Dict], Optional[str]]:
+async def process_chat_message(message: str, conversation_id: str, personalized: bool = False, speech_speed: float = 1.0, priority: int = PRIORITY_REST) -> tuple[str, List[Dict], Optional[str]]:
     """Process a chat message with function calling support, memory, and TTS"""
     
     # Get or create conversation history
@@ -789,11 +1229,23 @@ async def process_chat_message(message: str, conversation_id: str, personalized:
             {"role": "system", "content": get_system_prompt()}
         ]
     
-    # Get relevant conversation history from ChromaDB
-    relevant_history = get_relevant_conversation_history(message, conversation_id, limit=2)
+    # Remember where this turn starts so a rejected turn can be rolled back
+    turn_start = len(conversations[conversation_id])
+    turn_started = time.perf_counter()
+    
+    # Answer greetings, thanks and capability questions without retrieval or the LLM
+    fast_answer = fast_path_router.answer_template(message)
+    if fast_answer:
+        return complete_fast_path_turn(conversation_id, message, fast_answer, speech_speed, turn_started)
     
-    # Get relevant travel knowledge from ChromaDB
-    relevant_knowledge = get_relevant_travel_knowledge(message, limit=3)
+    # Get relevant conversation history and travel knowledge concurrently, off the event loop
+    relevant_history, relevant_knowledge = await retrieve_context(message, conversation_id, personalized)
+    
+    # Short knowledge questions with a close match are answered from the top hit
+    if not personalized:
+        fast_answer = fast_path_router.answer_knowledge(message, relevant_knowledge, tool_selector.needs_tools)
+        if fast_answer:
+            return complete_fast_path_turn(conversation_id, message, fast_answer, speech_speed, turn_started)
     
     # Enhance system prompt with relevant context
     enhanced_context = ""
@@ -806,7 +1258,9 @@ async def process_chat_message(message: str, conversation_id: str, personalized:
     if relevant_knowledge:
         enhanced_context += "\n\n📚 **Relevant Travel Knowledge:**\n"
         for knowledge in relevant_knowledge:
-            enhanced_context += f"- **{knowledge['title']}**: {knowledge['content'][:150]}...\n"
+            # Reranked hits carry an excerpt already fitted to the context token budget
+            excerpt = knowledge.get('excerpt') or f"{knowledge['content'][:150]}..."
+            enhanced_context += f"- **{knowledge['title']}**: {excerpt}\n"
     
     # Add user personalization context if enabled
     if personalized:
@@ -830,14 +1284,9 @@ async def process_chat_message(message: str, conversation_id: str, personalized:
             loyalty_programs = [f"{prog['program']} ({prog['tier']})" for prog in user_mock_data['loyalty_programs']]
             enhanced_context += f"- Loyalty Programs: {', '.join(loyalty_programs)}\n"
     
-    # Add enhanced context to the conversation if available
-    if enhanced_context:
-        conversations[conversation_id].append({
-            "role": "system",
-            "content": f"Context from your knowledge base and previous conversations:{enhanced_context}"
-        })
-    
-    # Add user message to conversation
+    # Add user message to conversation; the retrieved context is not stored in the
+    # history but injected per request, after the cacheable prefix
+    user_index = len(conversations[conversation_id])
     conversations[conversation_id].append({
         "role": "user", 
         "content": message,
@@ -848,14 +1297,21 @@ async def process_chat_message(message: str, conversation_id: str, personalized:
     function_calls_made = []
     
     try:
-        # Make initial API call with function calling
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=conversations[conversation_id],
-            functions=function_definitions,
-            function_call="auto",
-            max_tokens=2000,
-            temperature=0.7
+        # Only send the tool schemas this turn is likely to need
+        selected_functions = tool_selector.select(message, conversations[conversation_id][:-1])
+        request_functions = tool_selector.request_functions(selected_functions)
+        function_args_for_call = {}
+        if request_functions:
+            function_args_for_call = {"functions": request_functions, "function_call": "auto"}
+        
+        # Make initial API call with function calling on the cheapest suitable tier
+        turn_tier = model_cascade.initial_tier(message, selected_functions)
+        response, turn_tier = await cascade_chat_completion(
+            turn_tier,
+            priority,
+            messages=build_request_messages(conversation_id, user_index, enhanced_context),
+            temperature=0.7,
+            **function_args_for_call
         )
         
         assistant_message = response.choices[0].message
@@ -890,11 +1346,11 @@ async def process_chat_message(message: str, conversation_id: str, personalized:
                 "content": json.dumps(function_result)
             })
             
-            # Get final response with function result
-            final_response = client.chat.completions.create(
-                model=model_name,
-                messages=conversations[conversation_id],
-                max_tokens=2000,
+            # Get final response with function result (summarizing tool output is a fast-tier job)
+            final_response, _ = await cascade_chat_completion(
+                model_cascade.summary_tier(turn_tier),
+                priority,
+                messages=build_request_messages(conversation_id, user_index, enhanced_context),
                 temperature=0.7
             )
             
@@ -927,12 +1383,15 @@ async def process_chat_message(message: str, conversation_id: str, personalized:
             #     audio_base64 = generate_speech_openai(final_message)
         
         # Keep conversation history manageable
-        if len(conversations[conversation_id]) > 20:
-            # Keep system message and last 18 messages
-            conversations[conversation_id] = [conversations[conversation_id][0]] + conversations[conversation_id][-18:]
+        trim_conversation(conversation_id)
         
+        fast_path_router.record(None, time.perf_counter() - turn_started)
         return final_message, function_calls_made, audio_base64
         
+    except AdmissionRejected:
+        # Leave no half-finished turn behind; the caller reports retry-after
+        del conversations[conversation_id][turn_start:]
+        raise
     except Exception as e:
         error_message = f"I apologize, but I encountered an error while processing your request: {str(e)}"
         conversations[conversation_id].append({
@@ -965,7 +1424,21 @@ async def websocket_endpoint(websocket: WebSocket):
             
             if user_message.strip():
                 # Process the message
-                response, function_calls, audio_base64 = await process_chat_message(user_message, conversation_id, personalized, speech_speed)
+                try:
+                    response, function_calls, audio_base64 = await process_chat_message(
+                        user_message, conversation_id, personalized, speech_speed, priority=PRIORITY_INTERACTIVE
+                    )
+                except AdmissionRejected as e:
+                    busy_data = {
+                        "response": "TravelBot is handling a lot of requests right now. Please try again in a moment.",
+                        "function_calls": [],
+                        "audio_base64": None,
+                        "conversation_id": conversation_id,
+                        "error": "overloaded",
+                        "retry_after": e.retry_after
+                    }
+                    await manager.send_personal_message(json.dumps(busy_data), websocket)
+                    continue
                 
                 # Send response back to client
                 response_data = {
@@ -996,6 +1469,12 @@ async def chat_endpoint(request: ChatRequest):
             function_calls=function_calls,
             audio_base64=audio_base64
         )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1037,6 +1516,13 @@ async def list_conversations():
 @app.post("/api/tts")
 async def generate_tts(request: TTSRequest):
     """Generate text-to-speech audio for given text with speed control"""
+    if ensure_tts_loading():
+        raise HTTPException(
+            status_code=503,
+            detail="TTS model is still loading, try again shortly",
+            headers={"Retry-After": "10"}
+        )
+
     try:
         if not request.text.strip():
             raise HTTPException(status_code=400, detail="Text cannot be empty")
@@ -1067,77 +1553,6 @@ async def generate_tts(request: TTSRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TTS error: {str(e)}")
 
-# Export functionality
-def export_messages_to_excel(messages: List[Dict[str, Any]], filename: Optional[str] = None) -> BytesIO:
-    """Export messages to Excel format"""
-    if not filename:
-        filename = f"chat_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    
-    # Create a workbook and worksheet
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Prepare data for Excel
-        data = []
-        for msg in messages:
-            data.append({
-                'Role': msg.get('role', 'unknown'),
-                'Content': msg.get('content', ''),
-                'Timestamp': msg.get('timestamp', ''),
-                'Function Call': msg.get('function_call', {}).get('name', '') if msg.get('function_call') else ''
-            })
-        
-        df = pd.DataFrame(data)
-        df.to_excel(writer, sheet_name='Chat Messages', index=False)
-        
-        # Get the workbook and worksheet objects
-        workbook = writer.book
-        worksheet = writer.sheets['Chat Messages']
-        
-        # Adjust column width for content
-        worksheet.column_dimensions['B'].width = 100  # Content column
-        
-        # Style the header
-        from openpyxl.styles import Font, PatternFill
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        
-        for cell in worksheet[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-    
-    output.seek(0)
-    return output
-
-def export_messages_to_txt(messages: List[Dict[str, Any]], filename: Optional[str] = None) -> StringIO:
-    """Export messages to TXT format"""
-    if not filename:
-        filename = f"chat_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-    
-    output = StringIO()
-    
-    for i, msg in enumerate(messages):
-        role = msg.get('role', 'unknown')
-        content = msg.get('content', '')
-        timestamp = msg.get('timestamp', '')
-        
-        if content.strip():  # Only add non-empty content
-            if role == 'user':
-                output.write(f"👤 USER: {content}\n")
-            elif role == 'assistant':
-                output.write(f"🤖 ASSISTANT: {content}\n")
-            elif role == 'system':
-                output.write(f"⚙️ SYSTEM: {content}\n")
-            
-            if timestamp:
-                output.write(f"   📅 {timestamp}\n")
-            
-            # Add separator between messages (except for the last one)
-            if i < len(messages) - 1:
-                output.write("\n" + "="*50 + "\n\n")
-    
-    output.seek(0)
-    return output
-
 @app.post("/api/export")
 async def export_messages(request: ExportRequest):
     """Export selected messages to Excel or TXT format"""
@@ -1195,14 +1610,33 @@ async def get_stats():
     """Get system statistics"""
     try:
         # Get ChromaDB statistics
-        conversation_count = user_conversations_collection.count()
+        conversation_count = conversation_store.count()
         knowledge_count = travel_knowledge_collection.count()
         
         return {
             "active_conversations": len(conversations),
             "stored_conversations": conversation_count,
             "knowledge_base_entries": knowledge_count,
-            "tts_available": tts_model is not None,
+            "knowledge_index_entries": len(knowledge_index) if knowledge_index is not None else 0,
+            "tts_available": speech_synthesizer.available,
+            "request_coalescing": {
+                "tool_calls": tool_call_flight.stats(),
+                "completions": completion_flight.stats()
+            },
+            "llm_admission": llm_admission.stats(),
+            "llm_call_policy": llm_call_policy.stats(),
+            "tool_selection": tool_selector.stats(),
+            "fast_path": fast_path_router.stats(),
+            "model_cascade": model_cascade.stats(),
+            "retrieval": dict(retrieval_stats),
+            "knowledge_filter_stages": dict(knowledge_filter_stats),
+            "knowledge_result_cache": knowledge_result_cache.stats(),
+            "weather_cache": weather_cache.stats(),
+            "knowledge_rerank": knowledge_reranker.stats(),
+            "conversation_writes": conversation_writer.stats(),
+            "conversation_compaction": conversation_compactor.stats(),
+            "conversation_memory": conversation_memory_client.stats() if conversation_memory_client else {"backend": "chroma"},
+            "query_embeddings": {backend: embedder.stats() for backend, embedder in query_embedders.items()},
             "timestamp": datetime.now().isoformat()
         }
     
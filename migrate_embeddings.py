@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Re-embed ChromaDB collections with a different embedding backend
+
+Usage:
+    python migrate_embeddings.py travel_knowledge --backend local
+    python migrate_embeddings.py user_conversations travel_knowledge --backend openai
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Load environment variables
+load_dotenv()
+
+import chromadb
+from services.embeddings import (
+    DiskVectorCache, create_embedding_function, backend_id, migrate_collection,
+    OPENAI_BACKEND, LOCAL_BACKEND
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed ChromaDB collections with another embedding backend")
+    parser.add_argument("collections", nargs="+", help="Collection names to migrate")
+    parser.add_argument("--backend", choices=[OPENAI_BACKEND, LOCAL_BACKEND], required=True)
+    parser.add_argument("--model", default=None, help="Model name (defaults to the backend default)")
+    parser.add_argument("--path", default="./chroma_db", help="ChromaDB persistence directory")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    chroma_client = chromadb.PersistentClient(path=args.path)
+    disk_cache = DiskVectorCache(
+        os.getenv("EMBEDDING_DISK_CACHE_PATH", "./embedding_cache/vectors.sqlite3"),
+        max_entries=int(os.getenv("EMBEDDING_DISK_CACHE_MAX_ENTRIES", "100000"))
+    )
+    target_backend = backend_id(args.backend, args.model)
+
+    for name in args.collections:
+        # Conversation turns are user data and are never persisted in the vector cache
+        cache = None if name.startswith("user_conversations") else disk_cache
+        embedding_function = create_embedding_function(args.backend, args.model, cache)
+        print(f"🔄 Re-embedding '{name}' with {target_backend}...")
+        count = migrate_collection(chroma_client, name, embedding_function, target_backend, batch_size=args.batch_size)
+        print(f"✅ Migrated {count} documents in '{name}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# services/admission.py
+
+"""
+Admission control for upstream LLM calls.
+
+A global concurrency limit plus request/token-per-minute buckets gate every
+chat completion. Waiting callers are served by priority (interactive first),
+and once the queue is full new callers are rejected immediately with a
+retry-after hint instead of piling onto a rate-limited provider.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_REST = 1
+PRIORITY_BATCH = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_REST: "rest",
+    PRIORITY_BATCH: "batch",
+}
+
+
+class AdmissionRejected(Exception):
+    """Raised when the upstream queue is saturated"""
+
+    def __init__(self, retry_after: float, reason: str = "LLM queue is full"):
+        super().__init__(f"{reason}, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        """Return (or, if negative, charge) tokens after the real cost is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class Ticket:
+    """Handle for one admitted call; set actual_tokens once usage is known"""
+
+    def __init__(self, priority: int, estimated_tokens: int):
+        self.priority = priority
+        self.estimated_tokens = estimated_tokens
+        self.actual_tokens: Optional[int] = None
+        self.queued_at = time.monotonic()
+        self.queue_time = 0.0
+
+
+class AdmissionController:
+    """Priority-queued concurrency and rate limiter for upstream calls"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 200000,
+        max_queue: int = 100,
+        queue_timeout: float = 30.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+
+        self._queue: List = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._queue_times = {name: deque(maxlen=1000) for name in PRIORITY_NAMES.values()}
+
+    def _retry_after(self) -> float:
+        """Rough time for the current backlog to drain"""
+        backlog = len(self._queue) + self._active
+        return max(1.0, math.ceil(backlog / max(self.request_bucket.rate, 1e-6)))
+
+    def _pump(self):
+        """Admit queued callers while capacity and rate budget allow"""
+        self._wakeup = None
+        while self._queue and self._active < self.max_concurrency:
+            _, _, ticket, waiter = self._queue[0]
+            if waiter.done():
+                heapq.heappop(self._queue)
+                continue
+
+            wait = max(
+                self.request_bucket.wait_time(1),
+                self.token_bucket.wait_time(ticket.estimated_tokens),
+            )
+            if wait > 0:
+                self._wakeup = asyncio.get_running_loop().call_later(wait, self._pump)
+                return
+
+            heapq.heappop(self._queue)
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(ticket.estimated_tokens)
+            self._active += 1
+            waiter.set_result(None)
+
+    def _release(self, ticket: Ticket):
+        self._active -= 1
+        if ticket.actual_tokens is not None:
+            self.token_bucket.refund(ticket.estimated_tokens - ticket.actual_tokens)
+        if self._wakeup is None:
+            self._pump()
+
+    def _abandon(self, entry: tuple):
+        """Drop a waiter that gave up, handing back its slot if one was granted meanwhile"""
+        ticket, waiter = entry[2], entry[3]
+        if waiter.done() and not waiter.cancelled():
+            self._release(ticket)
+            return
+        try:
+            self._queue.remove(entry)
+        except ValueError:
+            return
+        heapq.heapify(self._queue)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_REST, estimated_tokens: int = 1000):
+        """Wait for an upstream slot; raises AdmissionRejected when saturated"""
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self._retry_after())
+
+        ticket = Ticket(priority, estimated_tokens)
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), ticket, waiter)
+        heapq.heappush(self._queue, entry)
+        if self._wakeup is None:
+            self._pump()
+
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._abandon(entry)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            raise AdmissionRejected(self._retry_after(), reason="Timed out waiting for an LLM slot")
+
+        ticket.queue_time = time.monotonic() - ticket.queued_at
+        self._queue_times[PRIORITY_NAMES.get(priority, "batch")].append(ticket.queue_time)
+        self.admitted += 1
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, admission counters and queue-time percentiles"""
+        queue_times = {}
+        for name, samples in self._queue_times.items():
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            queue_times[name] = {
+                "count": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2),
+            }
+        return {
+            "active": self._active,
+            "queued": len(self._queue),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_time": queue_times,
+        }
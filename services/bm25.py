@@ -0,0 +1,138 @@
+# services/bm25.py
+
+"""
+Keyword retrieval for the Travel Assistant Chatbot.
+
+A compact in-memory inverted index with BM25 scoring. It catches exact terms
+that embeddings blur (city names, "Eurail", "visa", currency codes), can be
+fused with vector results via reciprocal-rank fusion, and works on its own
+when no embeddings are available.
+"""
+
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from how i in is it me my of on or should "
+    "so that the their there these this to was what when where which who why will with you your".split()
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring and incremental updates"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._doc_tokens: Dict[str, List[str]] = {}
+        self._payloads: Dict[str, Any] = {}
+        self._hashes: Dict[str, Optional[str]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def upsert(self, doc_id: str, fields: Sequence[tuple], payload: Any = None, content_hash: Optional[str] = None):
+        """Index a document from (text, weight) fields, replacing any previous version"""
+        if doc_id in self._lengths:
+            self.remove(doc_id)
+        counts: Counter = Counter()
+        for text, weight in fields:
+            for token in tokenize(text or ""):
+                counts[token] += weight
+        for token, tf in counts.items():
+            self._postings.setdefault(token, {})[doc_id] = tf
+        length = sum(counts.values())
+        self._doc_tokens[doc_id] = list(counts)
+        self._lengths[doc_id] = length
+        self._total_length += length
+        self._payloads[doc_id] = payload
+        self._hashes[doc_id] = content_hash
+
+    def remove(self, doc_id: str):
+        if doc_id not in self._lengths:
+            return
+        for token in self._doc_tokens.pop(doc_id):
+            postings = self._postings[token]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[token]
+        self._total_length -= self._lengths.pop(doc_id)
+        self._payloads.pop(doc_id, None)
+        self._hashes.pop(doc_id, None)
+
+    def content_hash(self, doc_id: str) -> Optional[str]:
+        return self._hashes.get(doc_id)
+
+    def ids(self) -> Iterable[str]:
+        return list(self._lengths)
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        """Return up to k documents as {"id", "score", "payload"}, best first"""
+        n_docs = len(self._lengths)
+        if not n_docs:
+            return []
+        avg_length = self._total_length / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [{"id": doc_id, "score": score, "payload": self._payloads[doc_id]} for doc_id, score in ranked]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[tuple]:
+    """Fuse ranked id lists; returns (id, score) pairs, best first"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def passage_key(content: str) -> str:
+    """Hash of a passage's whitespace-normalized text, identical however it was indexed"""
+    return hashlib.sha1(" ".join(content.split()).encode("utf-8")).hexdigest()
+
+
+def fuse_hits(vector_hits: Sequence[Dict[str, Any]], keyword_hits: Sequence[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Fuse vector hits (dicts with an "id") with BM25 results into scored hit dicts.
+
+    Keyword-only hits are built from their payload and carry the maximum
+    distance (2.0), so distance thresholds never trust them. Hits are merged
+    by content hash rather than id, so a passage the vector store and the
+    keyword index know under different ids still appears once.
+    """
+    hits_by_key: Dict[str, Dict[str, Any]] = {}
+    rankings = []
+    for hits in (
+        [dict(hit["payload"], id=hit["id"], distance=2.0) for hit in keyword_hits],
+        list(vector_hits),
+    ):
+        ranking = []
+        for hit in hits:
+            key = passage_key(hit.get("content", ""))
+            if key in ranking:
+                continue
+            ranking.append(key)
+            # Vector hits (processed last) win, since they carry a real distance
+            hits_by_key[key] = hit
+        rankings.append(ranking)
+    fused = reciprocal_rank_fusion(rankings[::-1])
+    return [dict(hits_by_key[key], score=round(score, 6)) for key, score in fused[:limit]]
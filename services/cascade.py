@@ -0,0 +1,139 @@
+# services/cascade.py
+
+"""
+Model cascade for the Travel Assistant Chatbot.
+
+Routine turns and tool-result summaries go to a small, fast model. A turn is
+escalated to the full model up front when it looks hard (long message,
+explicit request for depth, many tools in play), or after the fact when the
+fast answer looks weak (truncated, empty or unsure).
+"""
+
+import re
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+FAST_TIER = "fast"
+FULL_TIER = "full"
+
+# Explicit signals that the user wants a long or careful answer
+ESCALATION_TRIGGERS = re.compile(
+    r"\b(itinerary|detailed|in detail|in depth|in-depth|step by step|step-by-step|compare|comparison"
+    r"|pros and cons|day by day|day-by-day|full plan|plan my|complete guide|explain why)\b",
+    re.IGNORECASE,
+)
+
+# Phrases that suggest the fast model was not confident in its answer
+UNSURE_ANSWER = re.compile(
+    r"\b(i'?m not sure|i am not sure|i don'?t know|i do not know|i'?m unable to|i cannot determine)\b",
+    re.IGNORECASE,
+)
+
+
+class ModelTier:
+    """One model in the cascade and its completion budget"""
+
+    def __init__(self, name: str, model: str, max_tokens: int):
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.latencies = deque(maxlen=1000)
+
+
+class ModelCascade:
+    """Choose a model tier per completion and track per-tier metrics"""
+
+    def __init__(
+        self,
+        fast_model: Optional[str],
+        full_model: str,
+        fast_max_tokens: int = 800,
+        full_max_tokens: int = 2000,
+        max_fast_words: int = 60,
+        max_fast_tools: int = 2,
+    ):
+        self.enabled = bool(fast_model) and fast_model != full_model
+        self.tiers = {
+            FAST_TIER: ModelTier(FAST_TIER, fast_model or full_model, fast_max_tokens),
+            FULL_TIER: ModelTier(FULL_TIER, full_model, full_max_tokens),
+        }
+        self.max_fast_words = max_fast_words
+        self.max_fast_tools = max_fast_tools
+        self.escalations: Dict[str, int] = {}
+
+    def _escalate(self, reason: str) -> str:
+        self.escalations[reason] = self.escalations.get(reason, 0) + 1
+        return FULL_TIER
+
+    def initial_tier(self, message: str, selected_functions: List[Dict[str, Any]]) -> str:
+        """Pick the tier for the first completion of a turn"""
+        if not self.enabled:
+            return FULL_TIER
+        if ESCALATION_TRIGGERS.search(message):
+            return self._escalate("explicit_trigger")
+        if len(message.split()) > self.max_fast_words:
+            return self._escalate("long_message")
+        if len(selected_functions) > self.max_fast_tools:
+            return self._escalate("many_tools")
+        return FAST_TIER
+
+    def summary_tier(self, turn_tier: str) -> str:
+        """Tool-result summaries stay on the fast tier unless the turn was escalated"""
+        return turn_tier if self.enabled else FULL_TIER
+
+    def escalation_reason(self, tier: str, response: Any) -> Optional[str]:
+        """Return why a fast-tier response should be redone on the full model, if at all"""
+        if not self.enabled or tier != FAST_TIER:
+            return None
+        choice = response.choices[0]
+        if getattr(choice.message, "function_call", None):
+            return None
+        content = choice.message.content or ""
+        if choice.finish_reason == "length":
+            reason = "truncated"
+        elif not content.strip():
+            reason = "empty"
+        elif UNSURE_ANSWER.search(content):
+            reason = "low_confidence"
+        else:
+            return None
+        self._escalate(reason)
+        return reason
+
+    def record(self, tier: str, seconds: float, response: Any):
+        """Record latency and token usage for one completion"""
+        model_tier = self.tiers[tier]
+        model_tier.calls += 1
+        model_tier.latencies.append(seconds)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            model_tier.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            model_tier.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+            details = getattr(usage, "prompt_tokens_details", None)
+            model_tier.cached_prompt_tokens += getattr(details, "cached_tokens", 0) or 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-tier latency/token metrics and escalation counts"""
+        tiers = {}
+        for name, tier in self.tiers.items():
+            ordered = sorted(tier.latencies)
+            tiers[name] = {
+                "model": tier.model,
+                "max_tokens": tier.max_tokens,
+                "calls": tier.calls,
+                "prompt_tokens": tier.prompt_tokens,
+                "completion_tokens": tier.completion_tokens,
+                "cached_prompt_tokens": tier.cached_prompt_tokens,
+                "cached_token_ratio": round(tier.cached_prompt_tokens / tier.prompt_tokens, 4) if tier.prompt_tokens else 0.0,
+                "latency_p50_ms": round(ordered[len(ordered) // 2] * 1000, 2) if ordered else None,
+                "latency_p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2) if ordered else None,
+            }
+        return {
+            "enabled": self.enabled,
+            "tiers": tiers,
+            "escalations": dict(self.escalations),
+        }
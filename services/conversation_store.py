@@ -0,0 +1,375 @@
+# services/conversation_store.py
+
+"""
+Bounded storage for conversation turns in ChromaDB.
+
+Turns can live in one collection (the original layout), in monthly buckets
+(user_conversations_202410, ...) or in a fixed number of shards keyed by
+conversation id, so each history query searches a small index. A background
+compactor enforces retention: turns older than a maximum age are deleted, and
+turns beyond a per-conversation limit are either deleted or merged into one
+digest record. With monthly buckets, whole expired buckets are dropped and
+the turn limit applies per bucket.
+"""
+
+import asyncio
+import hashlib
+import time
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+SINGLE_LAYOUT = "single"
+MONTHLY_LAYOUT = "monthly"
+SHARDED_LAYOUT = "sharded"
+LAYOUTS = (SINGLE_LAYOUT, MONTHLY_LAYOUT, SHARDED_LAYOUT)
+
+DELETE_MODE = "delete"
+MERGE_MODE = "merge"
+
+DIGEST_KIND = "digest"
+
+
+def record_time(metadata: Dict[str, Any]) -> float:
+    """Epoch seconds of a stored turn; older records only carry an ISO timestamp"""
+    if isinstance(metadata.get("ts"), (int, float)):
+        return float(metadata["ts"])
+    try:
+        return datetime.fromisoformat(metadata["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+def month_bucket(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y%m")
+
+
+def previous_month(bucket: str) -> str:
+    year, month = int(bucket[:4]), int(bucket[4:])
+    return f"{year - 1}12" if month == 1 else f"{year}{month - 1:02d}"
+
+
+def bucket_end(bucket: str) -> float:
+    """Epoch seconds at the start of the month after a bucket"""
+    year, month = int(bucket[:4]), int(bucket[4:])
+    return datetime(year + month // 12, month % 12 + 1, 1).timestamp()
+
+
+class RetentionPolicy:
+    """How long, and how many, turns to keep per conversation (0 disables a limit)"""
+
+    def __init__(self, max_age_days: float = 0, max_turns: int = 0, mode: str = DELETE_MODE, max_digest_chars: int = 4000):
+        if mode not in (DELETE_MODE, MERGE_MODE):
+            raise ValueError(f"Unknown compaction mode: {mode}")
+        self.max_age_days = max_age_days
+        self.max_turns = max_turns
+        self.mode = mode
+        self.max_digest_chars = max_digest_chars
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_age_days or self.max_turns)
+
+    def cutoff(self, now: float) -> Optional[float]:
+        return now - self.max_age_days * 86400 if self.max_age_days else None
+
+
+class CompactionResult:
+    """Counts of what a compaction pass changed"""
+
+    def __init__(self):
+        self.scanned = 0
+        self.expired = 0
+        self.trimmed = 0
+        self.merged = 0
+        self.dropped_collections = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.expired or self.trimmed or self.merged or self.dropped_collections)
+
+    def __str__(self) -> str:
+        return (f"{self.scanned} scanned, {self.expired} expired, {self.trimmed} trimmed, "
+                f"{self.merged} merged into digests, {self.dropped_collections} collections dropped")
+
+
+class ConversationStore:
+    """Route conversation turns to collections by layout and query across them"""
+
+    def __init__(
+        self,
+        client: Any,
+        base_name: str,
+        open_collection: Callable[[str], Any],
+        embedding_function: Callable[[List[str]], List[Any]],
+        layout: str = SINGLE_LAYOUT,
+        shards: int = 8,
+        query_buckets: int = 2,
+    ):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown conversation layout: {layout}")
+        self.client = client
+        self.base_name = base_name
+        self.open_collection = open_collection
+        self.embedding_function = embedding_function
+        self.layout = layout
+        self.shards = shards
+        self.query_buckets = query_buckets
+        self._collections: Dict[str, Any] = {}
+        self._bucket_names: Optional[set] = None
+
+    def _collection(self, name: str) -> Any:
+        if name not in self._collections:
+            self._collections[name] = self.open_collection(name)
+        return self._collections[name]
+
+    def collection_name(self, conversation_id: str, ts: float) -> str:
+        if self.layout == MONTHLY_LAYOUT:
+            return f"{self.base_name}_{month_bucket(ts)}"
+        if self.layout == SHARDED_LAYOUT:
+            shard = int(hashlib.sha1(conversation_id.encode("utf-8")).hexdigest(), 16) % self.shards
+            return f"{self.base_name}_s{shard}"
+        return self.base_name
+
+    def query_collection_names(self, conversation_id: str, now: Optional[float] = None) -> List[str]:
+        """Collections that can hold a conversation's recent turns, newest first"""
+        now = time.time() if now is None else now
+        if self.layout != MONTHLY_LAYOUT:
+            return [self.collection_name(conversation_id, now)]
+        buckets = [month_bucket(now)]
+        while len(buckets) < self.query_buckets:
+            buckets.append(previous_month(buckets[-1]))
+        # Bucket names are listed once, then tracked as buckets are written and dropped
+        if self._bucket_names is None:
+            self._bucket_names = set(self.existing_collection_names())
+        return [name for name in (f"{self.base_name}_{bucket}" for bucket in buckets) if name in self._bucket_names]
+
+    def existing_collection_names(self) -> List[str]:
+        """Names of this store's collections (chromadb returns names or Collection objects)"""
+        names = [getattr(c, "name", c) for c in self.client.list_collections()]
+        if self.layout == SINGLE_LAYOUT:
+            return [name for name in names if name == self.base_name]
+        prefix = self.base_name + ("_s" if self.layout == SHARDED_LAYOUT else "_")
+        return sorted(name for name in names if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+    def upsert(self, records: List[Dict[str, Any]]):
+        """Embed records in one call and upsert them, grouped by target collection"""
+        embeddings = self.embedding_function([record["document"] for record in records])
+        groups: Dict[str, List[tuple]] = {}
+        for record, embedding in zip(records, embeddings):
+            name = self.collection_name(record["metadata"]["conversation_id"], record_time(record["metadata"]))
+            groups.setdefault(name, []).append((record, embedding))
+        for name, group in groups.items():
+            if self._bucket_names is not None:
+                self._bucket_names.add(name)
+            self._collection(name).upsert(
+                ids=[record["id"] for record, _ in group],
+                embeddings=[embedding for _, embedding in group],
+                documents=[record["document"] for record, _ in group],
+                metadatas=[record["metadata"] for record, _ in group],
+            )
+
+    def query(self, query_embedding: Any, conversation_id: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Nearest turns of one conversation across its collections, closest first"""
+        hits = []
+        for name in self.query_collection_names(conversation_id):
+            results = self._collection(name).query(
+                query_embeddings=[query_embedding],
+                n_results=limit,
+                where={"conversation_id": conversation_id}
+            )
+            if not results["documents"]:
+                continue
+            for i, doc in enumerate(results["documents"][0]):
+                hits.append({
+                    "content": doc,
+                    "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
+                    "distance": results["distances"][0][i] if results["distances"] else 0
+                })
+        hits.sort(key=lambda hit: hit["distance"])
+        return hits[:limit]
+
+    def count(self) -> int:
+        return sum(self._collection(name).count() for name in self.existing_collection_names())
+
+    def compact(self, policy: RetentionPolicy, now: Optional[float] = None, page_size: int = 1000) -> CompactionResult:
+        """Apply a retention policy to every collection of the store"""
+        now = time.time() if now is None else now
+        result = CompactionResult()
+        cutoff = policy.cutoff(now)
+        for name in self.existing_collection_names():
+            # A monthly bucket that ended before the cutoff is dropped whole
+            if self.layout == MONTHLY_LAYOUT and cutoff is not None and name != self.collection_name("", now):
+                if bucket_end(name[-6:]) < cutoff:
+                    collection = self._collection(name)
+                    result.scanned += collection.count()
+                    result.expired += collection.count()
+                    self.client.delete_collection(name)
+                    self._collections.pop(name, None)
+                    if self._bucket_names is not None:
+                        self._bucket_names.discard(name)
+                    result.dropped_collections += 1
+                    continue
+            compact_collection(self._collection(name), policy, self.embedding_function, now, page_size, result)
+        return result
+
+
+def compact_collection(
+    collection: Any,
+    policy: RetentionPolicy,
+    embedding_function: Callable[[List[str]], List[Any]],
+    now: float,
+    page_size: int = 1000,
+    result: Optional[CompactionResult] = None,
+) -> CompactionResult:
+    """Expire old turns and trim (or merge) each conversation down to policy.max_turns"""
+    result = result or CompactionResult()
+    cutoff = policy.cutoff(now)
+
+    # Page through metadata only; documents are fetched just for turns being merged
+    by_conversation: Dict[str, List[tuple]] = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for doc_id, metadata in zip(page["ids"], page["metadatas"] or []):
+            metadata = metadata or {}
+            by_conversation.setdefault(metadata.get("conversation_id", ""), []).append(
+                (record_time(metadata), doc_id, metadata)
+            )
+        offset += len(page["ids"])
+        result.scanned += len(page["ids"])
+
+    to_delete: List[str] = []
+    digests = []
+    for conversation_id, turns in by_conversation.items():
+        turns.sort(key=lambda turn: turn[0], reverse=True)
+        if cutoff is not None:
+            expired = [turn for turn in turns if turn[0] < cutoff]
+            turns = [turn for turn in turns if turn[0] >= cutoff]
+            to_delete.extend(doc_id for _, doc_id, _ in expired)
+            result.expired += len(expired)
+
+        regular = [turn for turn in turns if turn[2].get("kind") != DIGEST_KIND]
+        if not policy.max_turns or len(regular) <= policy.max_turns:
+            continue
+        excess = regular[policy.max_turns:]
+        if policy.mode == DELETE_MODE:
+            to_delete.extend(doc_id for _, doc_id, _ in excess)
+            result.trimmed += len(excess)
+            continue
+
+        # Roll the excess turns and any earlier digest into one new digest
+        previous_digests = [turn for turn in turns if turn[2].get("kind") == DIGEST_KIND]
+        merged = sorted(previous_digests + excess, key=lambda turn: turn[0])
+        documents = dict(zip(*_ids_and_documents(collection, [doc_id for _, doc_id, _ in merged])))
+        text = "\n".join(documents.get(doc_id, "") for _, doc_id, _ in merged)
+        if len(text) > policy.max_digest_chars:
+            text = text[-policy.max_digest_chars:]
+        newest = merged[-1][0]
+        turn_count = sum(int(metadata.get("merged_turns", 1)) for _, _, metadata in merged)
+        digests.append({
+            "id": f"{conversation_id}_digest_{newest}",
+            "document": f"Earlier in this conversation:\n{text}",
+            "metadata": {
+                "conversation_id": conversation_id,
+                "kind": DIGEST_KIND,
+                "ts": newest,
+                "timestamp": datetime.fromtimestamp(newest).isoformat(),
+                "merged_turns": turn_count,
+            },
+        })
+        to_delete.extend(doc_id for _, doc_id, _ in merged)
+        result.merged += len(excess)
+
+    # Write digests before deleting what they replace
+    if digests:
+        collection.upsert(
+            ids=[digest["id"] for digest in digests],
+            embeddings=embedding_function([digest["document"] for digest in digests]),
+            documents=[digest["document"] for digest in digests],
+            metadatas=[digest["metadata"] for digest in digests],
+        )
+        digest_ids = {digest["id"] for digest in digests}
+        to_delete = [doc_id for doc_id in to_delete if doc_id not in digest_ids]
+    for start in range(0, len(to_delete), page_size):
+        collection.delete(ids=to_delete[start:start + page_size])
+    return result
+
+
+def _ids_and_documents(collection: Any, ids: List[str]) -> tuple:
+    data = collection.get(ids=ids, include=["documents"])
+    return data["ids"], data["documents"] or []
+
+
+class ConversationCompactor:
+    """Run a blocking compaction function periodically off the event loop"""
+
+    def __init__(self, compact_fn: Callable[[], CompactionResult], interval: float = 3600.0, executor: Optional[Executor] = None):
+        self.compact_fn = compact_fn
+        self.interval = interval
+        self.executor = executor
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.failures = 0
+        self.expired = 0
+        self.trimmed = 0
+        self.merged = 0
+        self.dropped_collections = 0
+        self.last_run: Optional[str] = None
+        self.last_duration = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def run_once(self) -> Optional[CompactionResult]:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(self.executor, self.compact_fn)
+        except Exception as e:
+            self.failures += 1
+            print(f"Error compacting conversations: {e}")
+            return None
+        self.runs += 1
+        self.expired += result.expired
+        self.trimmed += result.trimmed
+        self.merged += result.merged
+        self.dropped_collections += result.dropped_collections
+        self.last_run = datetime.now().isoformat()
+        self.last_duration = time.perf_counter() - started
+        if result.changed:
+            print(f"Compacted conversations: {result}")
+        return result
+
+    async def _run(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "expired": self.expired,
+            "trimmed": self.trimmed,
+            "merged": self.merged,
+            "dropped_collections": self.dropped_collections,
+            "last_run": self.last_run,
+            "last_duration_ms": round(self.last_duration * 1000, 1),
+        }
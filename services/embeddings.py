@@ -0,0 +1,269 @@
+# services/embeddings.py
+
+"""
+Embedding backends and query embedding helpers for the Travel Assistant Chatbot.
+
+Backends are ChromaDB embedding functions selectable per collection: the remote
+OpenAI endpoint or a local sentence-transformers model on CPU. Any backend can
+be wrapped with a size-capped on-disk vector cache (used for knowledge
+documents, never for user text), and CachedEmbedder makes sure a user's
+message is embedded once per turn (off the event loop when awaited).
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+OPENAI_BACKEND = "openai"
+LOCAL_BACKEND = "local"
+DEFAULT_OPENAI_MODEL = "text-embedding-3-small"
+DEFAULT_LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Shared pool for blocking embedding work (network calls or CPU-bound encoding)
+embedding_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EMBEDDING_WORKERS", "4")), thread_name_prefix="embedding"
+)
+
+
+class LocalEmbeddingFunction(EmbeddingFunction):
+    """Sentence-transformers model on CPU, loaded on first use, encoding in batches"""
+
+    def __init__(self, model_name: str = DEFAULT_LOCAL_MODEL, batch_size: int = 32, device: str = "cpu"):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def name() -> str:
+        return "travelbot_local"
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                print(f"🧮 Loading local embedding model {self.model_name}...")
+                self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def __call__(self, input: Documents) -> Embeddings:
+        model = self._model or self._load()
+        vectors = model.encode(
+            list(input),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return [vector.tolist() for vector in vectors]
+
+
+class DiskVectorCache:
+    """SQLite-backed vector cache keyed by (model id, text hash), evicting least recently used rows"""
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+        )
+        # Caches written before eviction existed have no last_used column
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(vectors)")}
+        if "last_used" not in columns:
+            self._conn.execute("ALTER TABLE vectors ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    @staticmethod
+    def key(model_id: str, text: str) -> str:
+        return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            now = time.time()
+            for start in range(0, len(keys), 500):
+                chunk = list(keys[start:start + 500])
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE vectors SET last_used = ? WHERE key IN ({placeholders})", [now] + chunk
+                    )
+            self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, Sequence[float]]):
+        with self._lock:
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            self._count = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+            excess = self._count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM vectors WHERE key IN (SELECT key FROM vectors ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self._count -= excess
+                self.evicted += excess
+            self._conn.commit()
+
+
+class DiskCachedEmbeddingFunction(EmbeddingFunction):
+    """Wrap an embedding function with a persistent vector cache"""
+
+    def __init__(self, backend: EmbeddingFunction, model_id: str, cache: DiskVectorCache):
+        self.backend = backend
+        self.model_id = model_id
+        self.cache = cache
+
+    @staticmethod
+    def name() -> str:
+        return "travelbot_disk_cached"
+
+    def __call__(self, input: Documents) -> Embeddings:
+        texts = list(input)
+        keys = [DiskVectorCache.key(self.model_id, text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            vectors = self.backend([texts[i] for i in missing])
+            fresh = {keys[i]: list(map(float, vector)) for i, vector in zip(missing, vectors)}
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+
+def backend_id(backend: str, model_name: Optional[str] = None) -> str:
+    """Identifier stored on collections so vectors from different models never mix"""
+    if backend == LOCAL_BACKEND:
+        return f"{LOCAL_BACKEND}:{model_name or DEFAULT_LOCAL_MODEL}"
+    return f"{OPENAI_BACKEND}:{model_name or DEFAULT_OPENAI_MODEL}"
+
+
+def create_embedding_function(backend: str, model_name: Optional[str] = None, disk_cache: Optional[DiskVectorCache] = None):
+    """Build the embedding function for a backend name ("openai" or "local")"""
+    if backend == LOCAL_BACKEND:
+        function = LocalEmbeddingFunction(
+            model_name or DEFAULT_LOCAL_MODEL,
+            batch_size=int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32")),
+        )
+    elif backend == OPENAI_BACKEND:
+        from chromadb.utils import embedding_functions
+        function = embedding_functions.OpenAIEmbeddingFunction(
+            api_key=os.getenv("OPENAI_API_KEY_EMBEDDING"),
+            model_name=model_name or DEFAULT_OPENAI_MODEL,
+        )
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    if disk_cache is not None:
+        function = DiskCachedEmbeddingFunction(function, backend_id(backend, model_name), disk_cache)
+    return function
+
+
+def migrate_collection(chroma_client: Any, name: str, embedding_function: Any, new_backend_id: str, batch_size: int = 100) -> int:
+    """Re-embed every document of a collection with a new embedding function.
+
+    The new vectors are written to a temporary collection first, so the old one
+    stays usable until the copy is complete; then the old collection is
+    dropped and the new one takes its name. Returns the number of documents.
+    """
+    source = chroma_client.get_collection(name=name)
+    data = source.get(include=["documents", "metadatas"])
+    metadata = dict(source.metadata or {})
+    metadata["embedding_backend"] = new_backend_id
+
+    temp_name = f"{name}__migrating"
+    try:
+        chroma_client.delete_collection(name=temp_name)
+    except Exception:
+        pass
+    target = chroma_client.create_collection(name=temp_name, embedding_function=embedding_function, metadata=metadata)
+
+    ids, documents, metadatas = data["ids"], data["documents"], data["metadatas"]
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        target.add(ids=ids[start:end], documents=documents[start:end], metadatas=metadatas[start:end])
+
+    chroma_client.delete_collection(name=name)
+    target.modify(name=name)
+    return len(ids)
+
+
+class CachedEmbedder:
+    """LRU-cached front for a ChromaDB embedding function"""
+
+    def __init__(self, embedding_function: Any, max_entries: int = 1024):
+        self.embedding_function = embedding_function
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, texts: Sequence[str]) -> List[Any]:
+        """Embed texts, calling the backend once for all cache misses"""
+        results: Dict[str, Any] = {}
+        missing: List[str] = []
+        with self._lock:
+            for text in texts:
+                if text in self._cache:
+                    self._cache.move_to_end(text)
+                    results[text] = self._cache[text]
+                    self.hits += 1
+                elif text not in missing:
+                    missing.append(text)
+                    self.misses += 1
+
+        if missing:
+            vectors = self.embedding_function(missing)
+            with self._lock:
+                for text, vector in zip(missing, vectors):
+                    results[text] = vector
+                    self._cache[text] = vector
+                    self._cache.move_to_end(text)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+        return [results[text] for text in texts]
+
+    def embed_one(self, text: str) -> Any:
+        return self.embed([text])[0]
+
+    async def aembed_one(self, text: str) -> Any:
+        """Embed one text on the shared embedding thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(embedding_executor, self.embed_one, text)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "cached_vectors": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,85 @@
+# services/exports.py
+
+"""
+Chat transcript export for the Travel Assistant Chatbot.
+
+pandas and openpyxl are imported only when an Excel export is requested, so
+they stay out of process startup.
+"""
+
+from datetime import datetime
+from io import BytesIO, StringIO
+from typing import Any, Dict, List, Optional
+
+
+def export_messages_to_excel(messages: List[Dict[str, Any]], filename: Optional[str] = None) -> BytesIO:
+    """Export messages to Excel format"""
+    if not filename:
+        filename = f"chat_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    
+    import pandas as pd
+    
+    # Create a workbook and worksheet
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        # Prepare data for Excel
+        data = []
+        for msg in messages:
+            data.append({
+                'Role': msg.get('role', 'unknown'),
+                'Content': msg.get('content', ''),
+                'Timestamp': msg.get('timestamp', ''),
+                'Function Call': msg.get('function_call', {}).get('name', '') if msg.get('function_call') else ''
+            })
+        
+        df = pd.DataFrame(data)
+        df.to_excel(writer, sheet_name='Chat Messages', index=False)
+        
+        # Get the workbook and worksheet objects
+        workbook = writer.book
+        worksheet = writer.sheets['Chat Messages']
+        
+        # Adjust column width for content
+        worksheet.column_dimensions['B'].width = 100  # Content column
+        
+        # Style the header
+        from openpyxl.styles import Font, PatternFill
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        
+        for cell in worksheet[1]:
+            cell.font = header_font
+            cell.fill = header_fill
+    
+    output.seek(0)
+    return output
+
+def export_messages_to_txt(messages: List[Dict[str, Any]], filename: Optional[str] = None) -> StringIO:
+    """Export messages to TXT format"""
+    if not filename:
+        filename = f"chat_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    
+    output = StringIO()
+    
+    for i, msg in enumerate(messages):
+        role = msg.get('role', 'unknown')
+        content = msg.get('content', '')
+        timestamp = msg.get('timestamp', '')
+        
+        if content.strip():  # Only add non-empty content
+            if role == 'user':
+                output.write(f"👤 USER: {content}\n")
+            elif role == 'assistant':
+                output.write(f"🤖 ASSISTANT: {content}\n")
+            elif role == 'system':
+                output.write(f"⚙️ SYSTEM: {content}\n")
+            
+            if timestamp:
+                output.write(f"   📅 {timestamp}\n")
+            
+            # Add separator between messages (except for the last one)
+            if i < len(messages) - 1:
+                output.write("\n" + "="*50 + "\n\n")
+    
+    output.seek(0)
+    return output
@@ -0,0 +1,154 @@
+# services/fast_path.py
+
+"""
+Local fast-path router for the Travel Assistant Chatbot.
+
+Greetings, thanks, goodbyes, "what can you do" and close knowledge-base
+matches are answered from templates or the top travel_knowledge hit without
+an LLM completion. Anything the router is not confident about falls through
+to the normal LLM path.
+"""
+
+import re
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+TEMPLATE_RESPONSES = {
+    "greeting": (
+        "👋 Hi there! I'm TravelBot, your AI travel assistant. Where are you dreaming of going? "
+        "I can check the weather, find flights and hotels, and suggest things to do."
+    ),
+    "thanks": (
+        "😊 You're welcome! Let me know if there's anything else I can help you plan for your trip."
+    ),
+    "goodbye": (
+        "✈️ Safe travels! Come back any time you need help planning your next adventure."
+    ),
+    "capabilities": (
+        "🌟 Here's what I can do for you:\n"
+        "- 🌤️ **Weather**: current conditions and forecasts for any city\n"
+        "- ✈️ **Flights**: search and compare flights between cities\n"
+        "- 🏨 **Hotels**: find accommodation with prices and amenities\n"
+        "- 🗺️ **Attractions**: discover museums, parks and things to do\n"
+        "- 💡 **Travel Tips**: advice on culture, safety, budget and packing\n\n"
+        "Just tell me where you're heading and what you need!"
+    ),
+}
+
+_TRAILING = r"[\s!.?,:;)(😊🙂👋🙏✈️❤️]*$"
+
+INTENT_PATTERNS = {
+    "greeting": re.compile(
+        r"^(hi|hello|hey|hiya|howdy|greetings|yo|good (morning|afternoon|evening))"
+        r"( there| travelbot| bot| friend)?" + _TRAILING
+    ),
+    "thanks": re.compile(
+        r"^(thanks|thank you|thx|ty|cheers|much appreciated|great,? thanks|ok,? thanks|perfect,? thanks)"
+        r"( so much| a lot| very much| again)?" + _TRAILING
+    ),
+    "goodbye": re.compile(
+        r"^(bye|goodbye|bye bye|see you|see ya|see you later|farewell|good night|that's all)" + _TRAILING
+    ),
+    "capabilities": re.compile(
+        r"^(help|what can you do|what do you do|how can you help( me)?|what are your (features|capabilities)"
+        r"|what can i ask( you)?|who are you)" + _TRAILING
+    ),
+}
+
+KNOWLEDGE_QUESTION = re.compile(
+    r"^(what|what's|how|when|where|which|any|best|tell me|should|is|are|do|can)\b|\?\s*$"
+)
+
+
+class FastPathAnswer:
+    """A response produced without calling the LLM"""
+
+    def __init__(self, intent: str, response: str, confidence: float):
+        self.intent = intent
+        self.response = response
+        self.confidence = confidence
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(message.lower().split())
+
+
+class FastPathRouter:
+    """Answer trivial turns locally and track how much traffic skips the LLM"""
+
+    def __init__(self, enabled: bool = True, max_knowledge_distance: float = 0.35, max_knowledge_words: int = 20):
+        self.enabled = enabled
+        self.max_knowledge_distance = max_knowledge_distance
+        self.max_knowledge_words = max_knowledge_words
+        self.turns = 0
+        self.fast_path_turns: Dict[str, int] = {}
+        self._latency = {"fast_path": deque(maxlen=1000), "llm": deque(maxlen=1000)}
+
+    def answer_template(self, message: str) -> Optional[FastPathAnswer]:
+        """Match greetings, thanks, goodbyes and capability questions"""
+        if not self.enabled:
+            return None
+        text = normalize_message(message)
+        for intent, pattern in INTENT_PATTERNS.items():
+            if pattern.match(text):
+                return FastPathAnswer(intent, TEMPLATE_RESPONSES[intent], 0.95)
+        return None
+
+    def answer_knowledge(
+        self,
+        message: str,
+        knowledge_hits: List[Dict[str, Any]],
+        needs_tools: Callable[[str], bool],
+    ) -> Optional[FastPathAnswer]:
+        """Answer a short knowledge question from a close travel_knowledge hit"""
+        if not self.enabled or not knowledge_hits:
+            return None
+        text = normalize_message(message)
+        if len(text.split()) > self.max_knowledge_words or not KNOWLEDGE_QUESTION.search(text):
+            return None
+        if needs_tools(message):
+            return None
+
+        top = knowledge_hits[0]
+        distance = top.get("distance", 1.0)
+        if distance > self.max_knowledge_distance:
+            return None
+
+        content = top["content"]
+        title = top["title"]
+        if content.startswith(f"{title}: "):
+            content = content[len(title) + 2:]
+        response = (
+            f"📚 **{title}**\n\n{content}\n\n"
+            "Want me to tailor this to a specific destination or check live weather, flights or hotels?"
+        )
+        return FastPathAnswer("knowledge", response, round(1 - distance / 2, 4))
+
+    def record(self, intent: Optional[str], seconds: float):
+        """Record a finished turn; intent is None for turns that went to the LLM"""
+        self.turns += 1
+        if intent is None:
+            self._latency["llm"].append(seconds)
+            return
+        self.fast_path_turns[intent] = self.fast_path_turns.get(intent, 0) + 1
+        self._latency["fast_path"].append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return fast-path share and per-path latency percentiles"""
+        fast = sum(self.fast_path_turns.values())
+        latency = {}
+        for path, samples in self._latency.items():
+            ordered = sorted(samples)
+            if ordered:
+                latency[path] = {
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+                }
+        return {
+            "enabled": self.enabled,
+            "turns": self.turns,
+            "fast_path_turns": fast,
+            "fast_path_share": round(fast / self.turns, 4) if self.turns else 0.0,
+            "by_intent": dict(self.fast_path_turns),
+            "latency": latency,
+        }
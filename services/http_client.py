@@ -0,0 +1,56 @@
+# services/http_client.py
+
+"""
+Shared HTTP client for external tool calls.
+
+One application-scoped httpx.AsyncClient keeps connections to the weather
+API (and any other tool backends) alive across calls, so a tool invocation
+reuses a warm connection instead of paying for DNS, TCP and TLS setup every
+time. Pool size, keep-alive, timeouts and HTTP/2 are configurable.
+"""
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client(
+    timeout: float = 10.0,
+    connect_timeout: float = 3.0,
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 30.0,
+    http2: bool = False,
+) -> httpx.AsyncClient:
+    """Pooled client; HTTP/2 is used only when requested and the h2 package is installed"""
+    if http2 and not http2_available():
+        print("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        http2=http2,
+    )
+
+
+@asynccontextmanager
+async def borrow_client(client: Optional[httpx.AsyncClient], timeout: float = 10.0) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the shared client, or a short-lived one when none was injected (e.g. scripts without app startup)"""
+    if client is not None and not client.is_closed:
+        yield client
+        return
+    async with httpx.AsyncClient(timeout=timeout) as fallback:
+        yield fallback
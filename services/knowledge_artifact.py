@@ -0,0 +1,122 @@
+# services/knowledge_artifact.py
+
+"""
+Precomputed knowledge embeddings shipped next to the knowledge module.
+
+A build step writes every entry's L2-normalized embedding to a .npy matrix,
+with a small JSON manifest holding the model id, ids and content hashes. At
+startup the matrix is memory-mapped straight into the in-memory index, and
+the ChromaDB sync takes vectors from it instead of calling the embedding API.
+Entries edited since the build no longer match their hash and are embedded
+as usual.
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from services.knowledge_sync import content_hash, knowledge_document, knowledge_id, knowledge_metadata
+from services.vector_index import VectorIndex
+
+ARTIFACT_VERSION = 1
+
+
+def artifact_paths(prefix: str) -> tuple:
+    return f"{prefix}.npy", f"{prefix}.json"
+
+
+def write_knowledge_artifact(prefix: str, entries: List[Dict[str, Any]], vectors: Any, model_id: str, dtype: Any = np.float32):
+    """Write normalized vectors and their manifest (the manifest last, so a partial build is never loaded)"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix_path, manifest_path = artifact_paths(prefix)
+    np.save(matrix_path, np.ascontiguousarray((matrix / norms).astype(dtype)))
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "model_id": model_id,
+        "dtype": np.dtype(dtype).name,
+        "dim": int(matrix.shape[1]),
+        "ids": [knowledge_id(entry) for entry in entries],
+        "hashes": [content_hash(entry) for entry in entries],
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+
+class KnowledgeArtifact:
+    """A loaded artifact; vectors are a read-only memory map"""
+
+    def __init__(self, model_id: str, ids: List[str], hashes: List[str], vectors: np.ndarray):
+        self.model_id = model_id
+        self.ids = ids
+        self.hashes = hashes
+        self.vectors = vectors
+        self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+
+    @classmethod
+    def load(cls, prefix: str, mmap: bool = True, model_id: Optional[str] = None) -> Optional["KnowledgeArtifact"]:
+        """Load an artifact; None if it is missing, of another version, or built with a model other than model_id"""
+        matrix_path, manifest_path = artifact_paths(prefix)
+        if not (os.path.exists(matrix_path) and os.path.exists(manifest_path)):
+            return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != ARTIFACT_VERSION:
+            return None
+        if model_id is not None and manifest["model_id"] != model_id:
+            print(f"⚠️ Precomputed knowledge embeddings are from {manifest['model_id']}, not {model_id}; ignoring them")
+            return None
+        vectors = np.load(matrix_path, mmap_mode="r" if mmap else None)
+        if vectors.shape != (len(manifest["ids"]), manifest["dim"]):
+            raise ValueError(f"Knowledge artifact {matrix_path} has shape {vectors.shape}, "
+                             f"manifest says {len(manifest['ids'])}x{manifest['dim']}")
+        return cls(manifest["model_id"], manifest["ids"], manifest["hashes"], vectors)
+
+    def current_rows(self, entries: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Artifact row for each entry whose content is unchanged since the build"""
+        rows = {}
+        for entry in entries:
+            doc_id = knowledge_id(entry)
+            row = self._rows.get(doc_id)
+            if row is not None and self.hashes[row] == content_hash(entry):
+                rows[doc_id] = row
+        return rows
+
+    def covers(self, entries: List[Dict[str, Any]]) -> bool:
+        return len(self.current_rows(entries)) == len(entries)
+
+    def embedding_function(self, entries: List[Dict[str, Any]], fallback: Callable[[List[str]], List[Any]]) -> Callable[[List[str]], List[Any]]:
+        """Embed documents from the artifact where possible, calling fallback once for the rest"""
+        rows = self.current_rows(entries)
+        by_document = {knowledge_document(entry): rows[knowledge_id(entry)]
+                       for entry in entries if knowledge_id(entry) in rows}
+
+        def embed(documents: List[str]) -> List[Any]:
+            missing = [document for document in documents if document not in by_document]
+            fresh = dict(zip(missing, fallback(missing))) if missing else {}
+            return [
+                np.asarray(self.vectors[by_document[document]], dtype=np.float32) if document in by_document
+                else fresh[document]
+                for document in documents
+            ]
+
+        return embed
+
+    def index(self, entries: List[Dict[str, Any]], dtype: Any = np.float32) -> VectorIndex:
+        """In-memory index over the artifact rows, in entry order, without copying the matrix when it can be avoided"""
+        rows = self.current_rows(entries)
+        order = [rows[knowledge_id(entry)] for entry in entries if knowledge_id(entry) in rows]
+        kept = [entry for entry in entries if knowledge_id(entry) in rows]
+        # Rows already in entry order keep the memory map as is; otherwise gather them
+        vectors = self.vectors if order == list(range(len(self.ids))) else self.vectors[order]
+        return VectorIndex(
+            [knowledge_id(entry) for entry in kept],
+            vectors,
+            [knowledge_document(entry) for entry in kept],
+            [knowledge_metadata(entry) for entry in kept],
+            dtype=dtype,
+            normalized=True,
+        )
@@ -0,0 +1,151 @@
+# services/knowledge_sync.py
+
+"""
+Incremental sync of the travel knowledge base into ChromaDB.
+
+Each entry gets a stable id (from its title) and a content hash. At startup
+only new or edited entries are embedded and upserted, and entries removed
+from knowledge/travel_knowledge.py are deleted, so the cost is proportional
+to the diff rather than the corpus.
+"""
+
+import hashlib
+from typing import Any, Callable, Dict, List, Optional
+
+
+def knowledge_id(entry: Dict[str, Any]) -> str:
+    """Stable id for an entry, independent of its position in the list"""
+    return "knowledge_" + hashlib.sha1(entry["title"].strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+def knowledge_document(entry: Dict[str, Any]) -> str:
+    return f"{entry['title']}: {entry['content']}"
+
+
+def knowledge_metadata(entry: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = {
+        "title": entry["title"],
+        "category": entry.get("category", "general"),
+        "region": entry.get("region", "global"),
+    }
+    if entry.get("tags"):
+        metadata["tags"] = ",".join(entry["tags"])
+    return metadata
+
+
+def content_hash(entry: Dict[str, Any]) -> str:
+    """Hash of everything that ends up in the index for an entry"""
+    payload = knowledge_document(entry) + "\0" + repr(sorted(knowledge_metadata(entry).items()))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SyncResult:
+    """Counts of what a sync changed"""
+
+    def __init__(self, added: int = 0, updated: int = 0, deleted: int = 0, unchanged: int = 0):
+        self.added = added
+        self.updated = updated
+        self.deleted = deleted
+        self.unchanged = unchanged
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.deleted)
+
+    def __str__(self) -> str:
+        return (f"{self.added} added, {self.updated} updated, "
+                f"{self.deleted} deleted, {self.unchanged} unchanged")
+
+
+def sync_knowledge(
+    collection: Any,
+    entries: List[Dict[str, Any]],
+    embedding_function: Callable[[List[str]], List[Any]],
+    batch_size: int = 100,
+    on_change: Optional[Callable[[SyncResult], None]] = None,
+) -> SyncResult:
+    """Bring a collection in line with the given entries, embedding only the diff"""
+    existing = collection.get(include=["metadatas"])
+    existing_hashes = {
+        doc_id: (metadata or {}).get("content_hash")
+        for doc_id, metadata in zip(existing["ids"], existing["metadatas"] or [])
+    }
+
+    result = SyncResult()
+    pending = []
+    wanted_ids = set()
+    for entry in entries:
+        doc_id = knowledge_id(entry)
+        wanted_ids.add(doc_id)
+        entry_hash = content_hash(entry)
+        if existing_hashes.get(doc_id) == entry_hash:
+            result.unchanged += 1
+            continue
+        if doc_id in existing_hashes:
+            result.updated += 1
+        else:
+            result.added += 1
+        metadata = knowledge_metadata(entry)
+        metadata["content_hash"] = entry_hash
+        pending.append((doc_id, knowledge_document(entry), metadata))
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        documents = [document for _, document, _ in batch]
+        collection.upsert(
+            ids=[doc_id for doc_id, _, _ in batch],
+            embeddings=embedding_function(documents),
+            documents=documents,
+            metadatas=[metadata for _, _, metadata in batch],
+        )
+
+    stale_ids = [doc_id for doc_id in existing_hashes if doc_id not in wanted_ids]
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+        result.deleted = len(stale_ids)
+
+    if result.changed and on_change is not None:
+        on_change(result)
+    return result
+
+
+def knowledge_hit(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Retrieval result for an entry, shaped like the vector search results"""
+    return {
+        "title": entry["title"],
+        "content": knowledge_document(entry),
+        "category": entry.get("category", "General"),
+        "region": entry.get("region", "global"),
+        "tags": list(entry.get("tags", [])),
+    }
+
+
+def sync_keyword_index(index: Any, entries: List[Dict[str, Any]]) -> SyncResult:
+    """Bring a BM25Index in line with the given entries, re-indexing only the diff"""
+    result = SyncResult()
+    wanted_ids = set()
+    for entry in entries:
+        doc_id = knowledge_id(entry)
+        wanted_ids.add(doc_id)
+        entry_hash = content_hash(entry)
+        previous = index.content_hash(doc_id)
+        if previous == entry_hash:
+            result.unchanged += 1
+            continue
+        if previous is None:
+            result.added += 1
+        else:
+            result.updated += 1
+        fields = [
+            (entry["title"], 2),
+            (entry["content"], 1),
+            (entry.get("category", "").replace("_", " "), 1),
+            (entry.get("region", ""), 1),
+        ]
+        index.upsert(doc_id, fields, payload=knowledge_hit(entry), content_hash=entry_hash)
+
+    for doc_id in index.ids():
+        if doc_id not in wanted_ids:
+            index.remove(doc_id)
+            result.deleted += 1
+    return result
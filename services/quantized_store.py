@@ -0,0 +1,369 @@
+# services/quantized_store.py
+
+"""
+Quantized local storage for conversation memory.
+
+A drop-in stand-in for the few ChromaDB client/collection calls the
+conversation store makes. Vectors are held in memory as int8 (with a
+per-vector scale) or float16 codes, partitioned by conversation id, so a
+history query scans only that conversation's codes. Full-precision vectors
+stay on disk in SQLite and are read back only for the top candidates, which
+are re-scored exactly before the final top-k is returned. The code dtype,
+rescore dtype and dimension are recorded in the file; reopening it with other
+settings re-encodes the rows from their full-precision vectors, or refuses
+with a clear error when that is not possible.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+INT8 = "int8"
+FLOAT16 = "float16"
+CODE_DTYPES = (INT8, FLOAT16)
+
+RESCORE_FLOAT32 = "float32"
+RESCORE_FLOAT16 = "float16"
+RESCORE_NONE = "none"
+RESCORE_DTYPES = (RESCORE_FLOAT32, RESCORE_FLOAT16, RESCORE_NONE)
+
+
+def code_numpy_dtype(code_dtype: str) -> np.dtype:
+    return np.dtype(np.int8) if code_dtype == INT8 else np.dtype(np.float16)
+
+
+def normalize(vectors: Any) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize(vectors: np.ndarray, code_dtype: str) -> tuple:
+    """Codes and per-vector scales for L2-normalized vectors (scales are 1 for float16)"""
+    if code_dtype == FLOAT16:
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class _Partition:
+    """Codes of one conversation, stacked for a single matrix-vector product"""
+
+    def __init__(self, dim: int, code_dtype: np.dtype):
+        self.ids: List[str] = []
+        self.codes = np.zeros((0, dim), dtype=code_dtype)
+        self.scales = np.zeros(0, dtype=np.float32)
+
+    def upsert(self, ids: List[str], codes: np.ndarray, scales: np.ndarray):
+        self.remove(set(ids))
+        self.ids.extend(ids)
+        self.codes = np.vstack([self.codes, codes])
+        self.scales = np.concatenate([self.scales, scales])
+
+    def remove(self, ids: set):
+        keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in ids]
+        if len(keep) != len(self.ids):
+            self.ids = [self.ids[i] for i in keep]
+            self.codes = self.codes[keep]
+            self.scales = self.scales[keep]
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        return (self.codes.astype(np.float32) @ query) * self.scales
+
+
+class QuantizedCollection:
+    """Collection-shaped wrapper over one logical collection in the store"""
+
+    def __init__(self, client: "QuantizedClient", name: str):
+        self.client = client
+        self.name = name
+        self._partitions: Dict[str, _Partition] = {}
+        self._owner: Dict[str, str] = {}
+
+    # Writes --------------------------------------------------------------
+
+    def upsert(self, ids: Sequence[str], embeddings: Any, documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        vectors = normalize(embeddings)
+        self.client._check_dim(vectors.shape[1])
+        codes, scales = quantize(vectors, self.client.code_dtype)
+        full = None if self.client.rescore == RESCORE_NONE else vectors.astype(self.client.rescore)
+
+        rows = []
+        for i, doc_id in enumerate(ids):
+            rows.append((
+                self.name, doc_id, (metadatas[i] or {}).get("conversation_id", ""), documents[i],
+                json.dumps(metadatas[i] or {}), codes[i].tobytes(), float(scales[i]),
+                full[i].tobytes() if full is not None else None,
+            ))
+        with self.client._lock:
+            self.client._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (collection, id, conversation_id, document, metadata, code, scale, full) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.client._conn.commit()
+            self._index(list(ids), [row[2] for row in rows], codes, scales)
+
+    def _index(self, ids: List[str], conversation_ids: List[str], codes: np.ndarray, scales: np.ndarray):
+        # Moving a turn to another conversation drops it from its old partition
+        moved = [(doc_id, self._owner[doc_id]) for doc_id, cid in zip(ids, conversation_ids)
+                 if self._owner.get(doc_id, cid) != cid]
+        for doc_id, old in moved:
+            self._partitions[old].remove({doc_id})
+        groups: Dict[str, List[int]] = {}
+        for i, cid in enumerate(conversation_ids):
+            groups.setdefault(cid, []).append(i)
+        for cid, rows in groups.items():
+            partition = self._partitions.setdefault(cid, _Partition(codes.shape[1], codes.dtype))
+            partition.upsert([ids[i] for i in rows], codes[rows], scales[rows])
+            for i in rows:
+                self._owner[ids[i]] = cid
+
+    def delete(self, ids: Sequence[str]):
+        ids = list(ids)
+        with self.client._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                self.client._conn.execute(
+                    f"DELETE FROM vectors WHERE collection = ? AND id IN ({','.join('?' * len(chunk))})",
+                    [self.name, *chunk]
+                )
+            self.client._conn.commit()
+            by_conversation: Dict[str, set] = {}
+            for doc_id in ids:
+                cid = self._owner.pop(doc_id, None)
+                if cid is not None:
+                    by_conversation.setdefault(cid, set()).add(doc_id)
+            for cid, doc_ids in by_conversation.items():
+                partition = self._partitions[cid]
+                partition.remove(doc_ids)
+                if not partition.ids:
+                    del self._partitions[cid]
+
+    # Reads ---------------------------------------------------------------
+
+    def count(self) -> int:
+        return len(self._owner)
+
+    def get(self, ids: Optional[Sequence[str]] = None, include: Sequence[str] = ("metadatas", "documents"),
+            limit: Optional[int] = None, offset: int = 0) -> Dict[str, Any]:
+        with self.client._lock:
+            if ids is not None:
+                ids = list(ids)
+                rows = []
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    rows += self.client._conn.execute(
+                        f"SELECT id, document, metadata FROM vectors WHERE collection = ? AND id IN ({','.join('?' * len(chunk))})",
+                        [self.name, *chunk]
+                    ).fetchall()
+            else:
+                rows = self.client._conn.execute(
+                    "SELECT id, document, metadata FROM vectors WHERE collection = ? ORDER BY rowid LIMIT ? OFFSET ?",
+                    (self.name, -1 if limit is None else limit, offset)
+                ).fetchall()
+        return {
+            "ids": [row[0] for row in rows],
+            "documents": [row[1] for row in rows] if "documents" in include else None,
+            "metadatas": [json.loads(row[2]) for row in rows] if "metadatas" in include else None,
+        }
+
+    def _full_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        placeholders = ",".join("?" * len(ids))
+        rows = self.client._conn.execute(
+            f"SELECT id, full FROM vectors WHERE collection = ? AND id IN ({placeholders})", [self.name, *ids]
+        ).fetchall()
+        return {doc_id: np.frombuffer(blob, dtype=self.client.rescore) for doc_id, blob in rows if blob is not None}
+
+    def query(self, query_embeddings: Any, n_results: int = 3, where: Optional[Dict[str, Any]] = None,
+              include: Sequence[str] = ("documents", "metadatas", "distances")) -> Dict[str, Any]:
+        """Nearest neighbours, filtered by at most an exact conversation_id match"""
+        if where and set(where) != {"conversation_id"}:
+            raise ValueError("QuantizedCollection only supports where={'conversation_id': ...}")
+        fields = [field for field in ("documents", "metadatas", "distances") if field in include]
+        results: Dict[str, Any] = {"ids": [], "documents": None, "metadatas": None, "distances": None}
+        for field in fields:
+            results[field] = []
+        for query in normalize(query_embeddings):
+            hits = self._search(query, n_results, where.get("conversation_id") if where else None)
+            rows = self.get(ids=[doc_id for doc_id, _ in hits], include=fields) if hits else {"ids": []}
+            by_id = {doc_id: i for i, doc_id in enumerate(rows["ids"])}
+            hits = [(doc_id, score) for doc_id, score in hits if doc_id in by_id]
+            results["ids"].append([doc_id for doc_id, _ in hits])
+            for field in ("documents", "metadatas"):
+                if field in fields:
+                    results[field].append([rows[field][by_id[doc_id]] for doc_id, _ in hits])
+            if "distances" in fields:
+                results["distances"].append([float(2.0 - 2.0 * score) for _, score in hits])
+        return results
+
+    def _search(self, query: np.ndarray, k: int, conversation_id: Optional[str]) -> List[tuple]:
+        with self.client._lock:
+            if conversation_id is not None:
+                partitions = [self._partitions[conversation_id]] if conversation_id in self._partitions else []
+            else:
+                partitions = list(self._partitions.values())
+            ids = [doc_id for partition in partitions for doc_id in partition.ids]
+            if not ids:
+                return []
+            scores = np.concatenate([partition.scores(query) for partition in partitions])
+
+            # Approximate scores pick the candidates; exact scores order them
+            candidates = min(len(ids), k * self.client.rescore_candidates if self.client.rescore != RESCORE_NONE else k)
+            top = np.argpartition(-scores, candidates - 1)[:candidates] if candidates < len(ids) else np.arange(len(ids))
+            hits = [(ids[i], float(scores[i])) for i in top]
+            if self.client.rescore != RESCORE_NONE:
+                full = self._full_vectors([doc_id for doc_id, _ in hits])
+                hits = [(doc_id, float(full[doc_id].astype(np.float32) @ query) if doc_id in full else score)
+                        for doc_id, score in hits]
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:k]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(p.codes.nbytes + p.scales.nbytes for p in self._partitions.values())
+
+
+class QuantizedClient:
+    """SQLite-backed store of quantized collections, loaded into memory on open"""
+
+    def __init__(self, path: str, code_dtype: str = INT8, rescore: str = RESCORE_FLOAT32, rescore_candidates: int = 4):
+        if code_dtype not in CODE_DTYPES:
+            raise ValueError(f"Unknown code dtype: {code_dtype}")
+        if rescore not in RESCORE_DTYPES:
+            raise ValueError(f"Unknown rescore dtype: {rescore}")
+        self.path = path
+        self.code_dtype = code_dtype
+        self.rescore = rescore
+        self.rescore_candidates = rescore_candidates
+        self.dim: Optional[int] = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "collection TEXT NOT NULL, id TEXT NOT NULL, conversation_id TEXT NOT NULL, document TEXT, "
+            "metadata TEXT, code BLOB NOT NULL, scale REAL NOT NULL, full BLOB, PRIMARY KEY (collection, id))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.RLock()
+        self._collections: Dict[str, QuantizedCollection] = {}
+        self._reconcile_format()
+        self._load()
+
+    def _read_meta(self) -> Dict[str, str]:
+        return dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def _write_meta(self):
+        values = {"code_dtype": self.code_dtype, "rescore": self.rescore}
+        if self.dim is not None:
+            values["dim"] = str(self.dim)
+        self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", list(values.items()))
+        self._conn.commit()
+
+    def _check_dim(self, dim: int):
+        """Pin the dimension on first write; vectors from another embedding model are refused"""
+        if self.dim is None:
+            with self._lock:
+                self.dim = dim
+                self._write_meta()
+        elif dim != self.dim:
+            raise ValueError(
+                f"Quantized store {self.path} holds {self.dim}-dimensional vectors, got {dim}; "
+                f"the embedding model changed, so re-embed into a new store"
+            )
+
+    def _reconcile_format(self):
+        """Make the stored rows match the configured dtypes, re-encoding them if needed"""
+        meta = self._read_meta()
+        first = self._conn.execute("SELECT code, full FROM vectors LIMIT 1").fetchone()
+        if first is None:
+            self._write_meta()
+            return
+        if not meta:
+            # Files written before the format was recorded use whatever was configured then;
+            # accept them only if the blob sizes agree with the current settings
+            stored_code, stored_rescore = self.code_dtype, self.rescore
+            dim = len(first[0]) // code_numpy_dtype(stored_code).itemsize
+            if first[1] is not None and (stored_rescore == RESCORE_NONE or len(first[1]) != dim * np.dtype(stored_rescore).itemsize):
+                raise ValueError(
+                    f"Quantized store {self.path} has no format record and its rows do not match "
+                    f"code dtype {self.code_dtype} / rescore {self.rescore}; restore the settings it was written with"
+                )
+        else:
+            stored_code, stored_rescore = meta["code_dtype"], meta["rescore"]
+            dim = int(meta["dim"]) if "dim" in meta else len(first[0]) // code_numpy_dtype(stored_code).itemsize
+        self.dim = dim
+
+        if (stored_code, stored_rescore) != (self.code_dtype, self.rescore):
+            if stored_rescore == RESCORE_NONE and stored_code != self.code_dtype:
+                raise ValueError(
+                    f"Quantized store {self.path} was written with code dtype {stored_code} and no full-precision "
+                    f"vectors, so it cannot be re-encoded as {self.code_dtype}; set QUANTIZED_MEMORY_DTYPE={stored_code} "
+                    f"or start a new store"
+                )
+            self._reencode(stored_rescore)
+        self._write_meta()
+
+    def _reencode(self, stored_rescore: str):
+        """Rewrite codes (and full vectors) in the configured dtypes from the stored full-precision rows"""
+        rows = self._conn.execute("SELECT rowid, full FROM vectors WHERE full IS NOT NULL").fetchall()
+        updates = []
+        for start in range(0, len(rows), 1000):
+            chunk = rows[start:start + 1000]
+            vectors = normalize(np.stack([np.frombuffer(blob, dtype=stored_rescore) for _, blob in chunk]))
+            codes, scales = quantize(vectors, self.code_dtype)
+            full = None if self.rescore == RESCORE_NONE else vectors.astype(self.rescore)
+            for i, (rowid, _) in enumerate(chunk):
+                updates.append((codes[i].tobytes(), float(scales[i]), full[i].tobytes() if full is not None else None, rowid))
+        self._conn.executemany("UPDATE vectors SET code = ?, scale = ?, full = ? WHERE rowid = ?", updates)
+        self._conn.commit()
+        print(f"🔁 Re-encoded {len(updates)} stored vectors as {self.code_dtype} codes (rescore {self.rescore})")
+
+    def _load(self):
+        """Rebuild the in-memory partitions from disk"""
+        dtype = code_numpy_dtype(self.code_dtype)
+        grouped: Dict[str, tuple] = {}
+        for name, doc_id, cid, code, scale in self._conn.execute(
+            "SELECT collection, id, conversation_id, code, scale FROM vectors ORDER BY rowid"
+        ):
+            ids, cids, codes, scales = grouped.setdefault(name, ([], [], [], []))
+            ids.append(doc_id)
+            cids.append(cid)
+            codes.append(np.frombuffer(code, dtype=dtype))
+            scales.append(scale)
+        for name, (ids, cids, codes, scales) in grouped.items():
+            self.get_or_create_collection(name)._index(ids, cids, np.vstack(codes), np.asarray(scales, dtype=np.float32))
+
+    def get_or_create_collection(self, name: str, **_: Any) -> QuantizedCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = QuantizedCollection(self, name)
+            return self._collections[name]
+
+    def list_collections(self) -> List[str]:
+        return list(self._collections)
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors WHERE collection = ?", (name,))
+            self._conn.commit()
+            self._collections.pop(name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        vectors = sum(c.count() for c in self._collections.values())
+        memory = sum(c.nbytes for c in self._collections.values())
+        return {
+            "code_dtype": self.code_dtype,
+            "rescore": self.rescore,
+            "vectors": vectors,
+            "memory_bytes": memory,
+            "float32_memory_bytes": vectors * (self.dim or 0) * 4,
+            "disk_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
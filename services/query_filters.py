@@ -0,0 +1,159 @@
+# services/query_filters.py
+
+"""
+Query understanding for filtered knowledge retrieval.
+
+Extracts the destination region and topic category from a message (or, for
+personalized turns, from the user profile) so knowledge search can be
+restricted to matching entries plus the region-independent "global" ones.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Set
+
+# Place name -> knowledge base regions it belongs to
+REGION_GAZETTEER = {
+    # Regions themselves
+    "europe": {"Europe"}, "european": {"Europe"}, "schengen": {"Europe"},
+    "southeast asia": {"Southeast Asia"}, "south east asia": {"Southeast Asia"},
+    "middle east": {"Middle East"}, "north america": {"North America"},
+    "africa": {"Africa"}, "african": {"Africa"}, "arctic": {"Arctic"},
+    # Europe
+    "france": {"Europe"}, "paris": {"Europe"}, "lyon": {"Europe"},
+    "spain": {"Europe"}, "barcelona": {"Europe"}, "madrid": {"Europe"}, "seville": {"Europe"},
+    "germany": {"Europe"}, "berlin": {"Europe"}, "munich": {"Europe"},
+    "uk": {"Europe"}, "united kingdom": {"Europe"}, "england": {"Europe"}, "london": {"Europe"},
+    "scotland": {"Europe"}, "edinburgh": {"Europe"}, "ireland": {"Europe"}, "dublin": {"Europe"},
+    "netherlands": {"Europe"}, "amsterdam": {"Europe"}, "belgium": {"Europe"}, "brussels": {"Europe"},
+    "portugal": {"Europe"}, "lisbon": {"Europe"}, "porto": {"Europe"},
+    "greece": {"Europe"}, "athens": {"Europe"}, "santorini": {"Europe"},
+    "switzerland": {"Europe"}, "zurich": {"Europe"}, "austria": {"Europe"}, "vienna": {"Europe"},
+    "czech republic": {"Europe"}, "prague": {"Europe"}, "hungary": {"Europe"}, "budapest": {"Europe"},
+    "croatia": {"Europe"}, "dubrovnik": {"Europe"}, "alps": {"Europe"},
+    "italy": {"Italy", "Europe"}, "italian": {"Italy", "Europe"}, "rome": {"Italy", "Europe"},
+    "florence": {"Italy", "Europe"}, "venice": {"Italy", "Europe"}, "milan": {"Italy", "Europe"},
+    "naples": {"Italy", "Europe"}, "tuscany": {"Italy", "Europe"}, "sicily": {"Italy", "Europe"},
+    "norway": {"Europe", "Arctic"}, "tromso": {"Europe", "Arctic"}, "finland": {"Europe", "Arctic"},
+    "lapland": {"Europe", "Arctic"}, "iceland": {"Europe", "Arctic"}, "reykjavik": {"Europe", "Arctic"},
+    "sweden": {"Europe"}, "stockholm": {"Europe"}, "denmark": {"Europe"}, "copenhagen": {"Europe"},
+    # Asia
+    "japan": {"Japan"}, "japanese": {"Japan"}, "tokyo": {"Japan"}, "kyoto": {"Japan"},
+    "osaka": {"Japan"}, "hokkaido": {"Japan"},
+    "thailand": {"Southeast Asia"}, "bangkok": {"Southeast Asia"}, "phuket": {"Southeast Asia"},
+    "chiang mai": {"Southeast Asia"}, "vietnam": {"Southeast Asia"}, "hanoi": {"Southeast Asia"},
+    "ho chi minh": {"Southeast Asia"}, "saigon": {"Southeast Asia"}, "da nang": {"Southeast Asia"},
+    "cambodia": {"Southeast Asia"}, "siem reap": {"Southeast Asia"}, "laos": {"Southeast Asia"},
+    "indonesia": {"Southeast Asia"}, "bali": {"Southeast Asia"}, "malaysia": {"Southeast Asia"},
+    "kuala lumpur": {"Southeast Asia"}, "singapore": {"Southeast Asia"},
+    "philippines": {"Southeast Asia"}, "manila": {"Southeast Asia"},
+    "india": {"India"}, "indian": {"India"}, "delhi": {"India"}, "mumbai": {"India"},
+    "goa": {"India"}, "jaipur": {"India"}, "kerala": {"India"},
+    # Middle East
+    "dubai": {"Middle East"}, "abu dhabi": {"Middle East"}, "uae": {"Middle East"},
+    "qatar": {"Middle East"}, "doha": {"Middle East"}, "oman": {"Middle East"},
+    "jordan": {"Middle East"}, "petra": {"Middle East"}, "saudi arabia": {"Middle East"},
+    "egypt": {"Middle East", "Africa"}, "cairo": {"Middle East", "Africa"},
+    # North America
+    "usa": {"North America"}, "united states": {"North America"}, "america": {"North America"},
+    "new york": {"North America"}, "los angeles": {"North America"}, "san francisco": {"North America"},
+    "chicago": {"North America"}, "las vegas": {"North America"}, "miami": {"North America"},
+    "canada": {"North America"}, "toronto": {"North America"}, "vancouver": {"North America"},
+    "mexico": {"North America"}, "cancun": {"North America"}, "alaska": {"North America", "Arctic"},
+    # Oceania
+    "australia": {"Australia"}, "sydney": {"Australia"}, "melbourne": {"Australia"},
+    "brisbane": {"Australia"}, "perth": {"Australia"},
+    # Africa
+    "kenya": {"Africa"}, "nairobi": {"Africa"}, "tanzania": {"Africa"}, "serengeti": {"Africa"},
+    "south africa": {"Africa"}, "cape town": {"Africa"}, "morocco": {"Africa"},
+    "marrakech": {"Africa"}, "botswana": {"Africa"}, "namibia": {"Africa"},
+}
+
+# Topic keyword -> knowledge base category
+CATEGORY_KEYWORDS = {
+    "food": ["food", "foods", "eat", "eating", "cuisine", "dish", "dishes", "restaurant", "restaurants", "street food"],
+    "transportation": ["train", "trains", "rail", "eurail", "interrail", "bus", "metro", "subway", "transport", "car rental", "road trip"],
+    "accommodation": ["hotel", "hotels", "hostel", "hostels", "accommodation", "airbnb", "lodging"],
+    "safety": ["safety", "safe", "scam", "scams", "insurance", "crime"],
+    "health": ["health", "vaccine", "vaccines", "vaccination", "medical", "sick", "jet lag"],
+    "visa": ["visa", "visas", "passport", "entry requirements"],
+    "money": ["money", "currency", "exchange rate", "atm", "cash", "credit card"],
+    "culture": ["etiquette", "culture", "customs", "tradition", "traditions"],
+    "events": ["festival", "festivals", "event", "events"],
+}
+
+
+def _compile(words) -> re.Pattern:
+    alternatives = sorted((re.escape(w) for w in words), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+
+
+_PLACE_PATTERN = _compile(REGION_GAZETTEER)
+_CATEGORY_PATTERNS = {category: _compile(words) for category, words in CATEGORY_KEYWORDS.items()}
+
+
+class KnowledgeFilter:
+    """Restrict knowledge search to some regions (always plus "global") and optionally a category"""
+
+    def __init__(self, regions: Optional[Set[str]] = None, category: Optional[str] = None):
+        self.regions = set(regions) | {"global"} if regions else None
+        self.category = category
+
+    def to_where(self) -> Optional[Dict[str, Any]]:
+        """ChromaDB `where` clause for this filter"""
+        clauses = []
+        if self.regions:
+            clauses.append({"region": {"$in": sorted(self.regions)}})
+        if self.category:
+            clauses.append({"category": self.category})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        if self.regions and metadata.get("region", "global") not in self.regions:
+            return False
+        if self.category and metadata.get("category") != self.category:
+            return False
+        return True
+
+    def __repr__(self) -> str:
+        return f"KnowledgeFilter(regions={sorted(self.regions) if self.regions else None}, category={self.category})"
+
+
+def extract_regions(text: str) -> Set[str]:
+    regions: Set[str] = set()
+    for match in _PLACE_PATTERN.findall(text or ""):
+        regions |= REGION_GAZETTEER[match.lower()]
+    return regions
+
+
+def extract_category(text: str) -> Optional[str]:
+    """Return the category with the most keyword hits, if any"""
+    best, best_hits = None, 0
+    for category, pattern in _CATEGORY_PATTERNS.items():
+        hits = len(pattern.findall(text or ""))
+        if hits > best_hits:
+            best, best_hits = category, hits
+    return best
+
+
+def build_filter_chain(message: str, profile: Optional[Dict[str, Any]] = None) -> List[KnowledgeFilter]:
+    """Filters to try in order, narrowest first; an empty list means search globally.
+
+    The destination comes from the message, or for personalized turns from the
+    profile's most recent search when the message names no place.
+    """
+    regions = extract_regions(message)
+    if not regions and profile:
+        last_destination = (profile.get("last_search") or {}).get("destination", "")
+        regions = extract_regions(last_destination)
+    category = extract_category(message)
+
+    chain = []
+    if regions and category:
+        chain.append(KnowledgeFilter(regions, category))
+    if regions:
+        chain.append(KnowledgeFilter(regions))
+    elif category:
+        chain.append(KnowledgeFilter(category=category))
+    return chain
@@ -0,0 +1,207 @@
+# services/reranker.py
+
+"""
+Cross-encoder reranking for the Travel Assistant Chatbot.
+
+Retrieval fetches a wider candidate set cheaply; a small cross-encoder then
+scores each (query, passage) pair on CPU and the best passages are kept until
+a context token budget is spent. Scores are cached per pair, and the stage
+skips itself when the remaining latency budget can't cover the pairs it would
+have to score, falling back to the retrieval order.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (chars / 4), matching the request estimates elsewhere"""
+    return len(text) // 4 + 1
+
+
+def fit_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, preferring a sentence boundary, then a word boundary"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentences = _SENTENCE_END.split(cut)
+    if len(sentences) > 1:
+        return " ".join(sentences[:-1])
+    return cut.rsplit(" ", 1)[0] + "..."
+
+
+class CrossEncoderReranker:
+    """Sentence-transformers cross-encoder on CPU, loaded on first use, with an LRU score cache"""
+
+    def __init__(self, model_name: str = DEFAULT_CROSS_ENCODER, batch_size: int = 32,
+                 device: str = "cpu", max_cache_entries: int = 4096):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self.max_cache_entries = max_cache_entries
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Smoothed cost of scoring one pair, used to predict whether a rerank fits the budget
+        self.seconds_per_pair = 0.005
+
+    def _load(self):
+        with self._load_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                print(f"🧮 Loading cross-encoder {self.model_name}...")
+                self._model = CrossEncoder(self.model_name, device=self.device)
+        return self._model
+
+    @staticmethod
+    def _key(query: str, passage: str) -> str:
+        return hashlib.sha1(f"{query.strip().lower()}\0{passage}".encode("utf-8")).hexdigest()
+
+    def uncached(self, query: str, passages: Sequence[str]) -> int:
+        with self._cache_lock:
+            return sum(self._key(query, passage) not in self._cache for passage in passages)
+
+    def score(self, query: str, passages: Sequence[str]) -> List[float]:
+        """Relevance scores for each passage, scoring only uncached pairs (in batches)"""
+        keys = [self._key(query, passage) for passage in passages]
+        scores: Dict[str, float] = {}
+        missing: List[int] = []
+        pending = set()
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[key] = self._cache[key]
+                    self.hits += 1
+                elif key not in pending:
+                    pending.add(key)
+                    missing.append(i)
+                    self.misses += 1
+
+        if missing:
+            model = self._model or self._load()
+            started = time.perf_counter()
+            fresh = model.predict([(query, passages[i]) for i in missing], batch_size=self.batch_size,
+                                  show_progress_bar=False)
+            per_pair = (time.perf_counter() - started) / len(missing)
+            with self._cache_lock:
+                self.seconds_per_pair = 0.8 * self.seconds_per_pair + 0.2 * per_pair
+                for i, value in zip(missing, fresh):
+                    scores[keys[i]] = float(value)
+                    self._cache[keys[i]] = float(value)
+                    self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.max_cache_entries:
+                    self._cache.popitem(last=False)
+
+        return [scores[key] for key in keys]
+
+
+class RerankStage:
+    """Rerank retrieval candidates within a latency budget and keep what fits a token budget"""
+
+    def __init__(self, reranker: CrossEncoderReranker, enabled: bool = False, candidates: int = 20,
+                 budget_seconds: Optional[float] = 0.15, max_context_tokens: int = 400, min_excerpt_tokens: int = 24):
+        self.reranker = reranker
+        self.enabled = enabled
+        self.candidates = candidates
+        self.budget_seconds = budget_seconds
+        self.max_context_tokens = max_context_tokens
+        self.min_excerpt_tokens = min_excerpt_tokens
+        self.available = True
+        self.runs = 0
+        self.skipped_budget = 0
+        self.skipped_unavailable = 0
+        self.total_time = 0.0
+        self.tokens_kept = 0
+        self.passages_kept = 0
+
+    def warm(self):
+        """Load the model and calibrate the per-pair cost before the first request"""
+        if not self.enabled:
+            return
+        try:
+            self.reranker.score("warm up", ["Travel tip: pack light.", "Visa rules vary by country."])
+        except Exception as e:
+            self.available = False
+            print(f"Reranker unavailable, using retrieval order: {e}")
+
+    def retrieval_limit(self, k: int) -> int:
+        return max(k, self.candidates) if self.enabled and self.available else k
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        """Best k hits that fit the token budget, or the first k unchanged if reranking is skipped.
+
+        The latency budget starts now, once the candidates are ready; reranking
+        only runs if the predicted cost of scoring the uncached pairs fits in it
+        (budget_seconds=None means no limit).
+        """
+        deadline = time.monotonic() + self.budget_seconds if self.budget_seconds is not None else None
+        if not self.enabled or len(hits) <= 1:
+            return hits[:k]
+        if not self.available:
+            self.skipped_unavailable += 1
+            return hits[:k]
+
+        # Hit content is already "title: content", as indexed
+        passages = [hit["content"] for hit in hits]
+        if deadline is not None:
+            predicted = self.reranker.uncached(query, passages) * self.reranker.seconds_per_pair
+            # Fully cached pairs cost next to nothing, so they run even past the deadline
+            if predicted and time.monotonic() + predicted > deadline:
+                self.skipped_budget += 1
+                return hits[:k]
+
+        started = time.perf_counter()
+        try:
+            scores = self.reranker.score(query, passages)
+        except Exception as e:
+            # Missing model or dependency: stop trying and keep the retrieval order
+            self.available = False
+            self.skipped_unavailable += 1
+            print(f"Reranker unavailable, using retrieval order: {e}")
+            return hits[:k]
+        self.total_time += time.perf_counter() - started
+        self.runs += 1
+
+        ranked = sorted(zip(scores, hits), key=lambda pair: pair[0], reverse=True)
+        kept, budget = [], self.max_context_tokens
+        for score, hit in ranked:
+            # A passage cut to a few words is noise; stop once the budget can't hold a useful excerpt
+            if len(kept) >= k or budget < self.min_excerpt_tokens:
+                break
+            excerpt = fit_to_tokens(hit["content"], budget)
+            if not excerpt:
+                break
+            budget -= estimate_tokens(excerpt)
+            kept.append(dict(hit, excerpt=excerpt, rerank_score=round(score, 4)))
+        self.passages_kept += len(kept)
+        self.tokens_kept += self.max_context_tokens - max(budget, 0)
+        return kept
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "available": self.available,
+            "model": self.reranker.model_name,
+            "runs": self.runs,
+            "skipped_budget": self.skipped_budget,
+            "skipped_unavailable": self.skipped_unavailable,
+            "avg_rerank_ms": round(self.total_time / self.runs * 1000, 2) if self.runs else 0.0,
+            "avg_passages_kept": round(self.passages_kept / self.runs, 2) if self.runs else 0.0,
+            "avg_context_tokens": round(self.tokens_kept / self.runs, 1) if self.runs else 0.0,
+            "score_cache_hits": self.reranker.hits,
+            "score_cache_misses": self.reranker.misses,
+            "ms_per_pair": round(self.reranker.seconds_per_pair * 1000, 3),
+        }
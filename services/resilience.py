@@ -0,0 +1,213 @@
+# services/resilience.py
+
+"""
+Deadlines, retries and hedging for upstream LLM calls.
+
+Each call gets an overall deadline and a per-attempt timeout. Failed attempts
+are retried with full-jitter exponential backoff, but only while a shared retry
+budget allows it, so an upstream outage cannot be amplified into a retry storm.
+Optionally, an attempt that is still running at the observed p95 latency is
+hedged with a second one and whichever finishes first wins. When an admission
+gate is supplied, each attempt first waits for its slot; that queue wait is
+neither timed, retried nor counted as latency.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when a call runs out of its overall deadline"""
+
+
+class LatencyTracker:
+    """Rolling window of successful attempt latencies"""
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-quantile, or None until enough samples are collected"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class RetryBudget:
+    """Cap retries and hedges to a fraction of recent traffic"""
+
+    def __init__(self, ratio: float = 0.1, min_balance: float = 10.0, max_balance: float = 100.0):
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self.balance = min_balance
+        self.requests = 0
+        self.retries = 0
+        self.denied = 0
+
+    def record_request(self):
+        self.requests += 1
+        self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.balance < 1:
+            self.denied += 1
+            return False
+        self.balance -= 1
+        self.retries += 1
+        return True
+
+
+class CallPolicy:
+    """Run an async attempt factory under a deadline, retry budget and hedging"""
+
+    def __init__(
+        self,
+        deadline: float = 45.0,
+        attempt_timeout: float = 20.0,
+        max_retries: int = 2,
+        base_backoff: float = 0.25,
+        max_backoff: float = 4.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        retryable: Tuple[Type[BaseException], ...] = (asyncio.TimeoutError,),
+        retry_budget: Optional[RetryBudget] = None,
+        latency: Optional[LatencyTracker] = None,
+    ):
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.retryable = retryable
+        self.retry_budget = retry_budget or RetryBudget()
+        self.latency = latency or LatencyTracker()
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.deadlines_exceeded = 0
+
+    async def _timed_attempt(
+        self,
+        attempt: Callable[..., Awaitable[Any]],
+        timeout: float,
+        deadline_at: float,
+        admit: Optional[Callable[[], AsyncContextManager]] = None,
+        started: Optional[asyncio.Event] = None,
+    ) -> Any:
+        # The attempt timeout starts only once admission has granted a slot
+        async with (admit() if admit is not None else nullcontext()) as admitted:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.deadlines_exceeded += 1
+                raise DeadlineExceeded(f"LLM call exceeded its {self.deadline:.0f}s deadline")
+            timeout = min(timeout, remaining)
+            if started is not None:
+                started.set()
+            began = time.monotonic()
+            call = attempt(timeout, admitted) if admit is not None else attempt(timeout)
+            result = await asyncio.wait_for(call, timeout=timeout)
+            self.latency.record(time.monotonic() - began)
+            return result
+
+    async def _hedged_attempt(
+        self,
+        attempt: Callable[..., Awaitable[Any]],
+        timeout: float,
+        deadline_at: float,
+        admit: Optional[Callable[[], AsyncContextManager]] = None,
+    ) -> Any:
+        first_started = asyncio.Event()
+        first = asyncio.ensure_future(self._timed_attempt(attempt, timeout, deadline_at, admit, first_started))
+        hedge_delay = self.latency.percentile(self.hedge_quantile) if self.hedge else None
+        if hedge_delay is None or hedge_delay >= timeout:
+            return await first
+
+        tasks = {first}
+        try:
+            # The hedge clock starts when the first attempt is running, not while it is queued
+            waiting = asyncio.ensure_future(first_started.wait())
+            await asyncio.wait({first, waiting}, return_when=asyncio.FIRST_COMPLETED)
+            waiting.cancel()
+
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done and self.retry_budget.try_spend():
+                self.hedges_sent += 1
+                tasks.add(asyncio.ensure_future(
+                    self._timed_attempt(attempt, timeout - hedge_delay, deadline_at, admit)
+                ))
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(
+        self,
+        attempt: Callable[..., Awaitable[Any]],
+        admit: Optional[Callable[[], AsyncContextManager]] = None,
+    ) -> Any:
+        """Call attempt(timeout) until it succeeds, the deadline passes or retries run out
+
+        With admit, each attempt runs inside admit() and is called as
+        attempt(timeout, admitted) with the value the context manager yields.
+        Errors raised while waiting for admission are not retried.
+        """
+        deadline_at = time.monotonic() + self.deadline
+        self.retry_budget.record_request()
+        retries = 0
+
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.deadlines_exceeded += 1
+                raise DeadlineExceeded(f"LLM call exceeded its {self.deadline:.0f}s deadline")
+
+            try:
+                return await self._hedged_attempt(attempt, self.attempt_timeout, deadline_at, admit)
+            except DeadlineExceeded:
+                raise
+            except self.retryable:
+                retries += 1
+                if retries > self.max_retries or not self.retry_budget.try_spend():
+                    raise
+                # Full jitter keeps synchronized clients from retrying in lockstep
+                backoff = random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** retries)))
+                if time.monotonic() + backoff >= deadline_at:
+                    raise
+                await asyncio.sleep(backoff)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return latency, retry and hedging counters for the stats endpoint"""
+        p50 = self.latency.percentile(0.5)
+        p95 = self.latency.percentile(0.95)
+        p99 = self.latency.percentile(0.99)
+        return {
+            "latency_p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+            "latency_p99_ms": round(p99 * 1000, 2) if p99 is not None else None,
+            "requests": self.retry_budget.requests,
+            "retries_and_hedges": self.retry_budget.retries,
+            "retries_denied_by_budget": self.retry_budget.denied,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "deadlines_exceeded": self.deadlines_exceeded,
+        }
@@ -0,0 +1,98 @@
+# services/retrieval_cache.py
+
+"""
+Retrieval result cache for the Travel Assistant Chatbot.
+
+The same knowledge lookups repeat across users ("budget tips Japan"). Results
+are cached by normalized query text plus the filters applied, with a TTL and
+LRU eviction, so hot queries skip both the embedding call and the search.
+Invalidating bumps a generation counter: everything cached before is dropped,
+and results computed against the old corpus are not stored afterwards.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace"""
+    return _WHITESPACE.sub(" ", _NON_WORD.sub(" ", (text or "").casefold())).strip()
+
+
+def make_key(query: str, filters: Optional[Sequence[Any]] = None, limit: int = 3) -> Hashable:
+    return (normalize_query(query), tuple(repr(f) for f in filters or ()), limit)
+
+
+class RetrievalCache:
+    """Thread-safe TTL + LRU cache with generation-based invalidation"""
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 600.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value, or None on a miss or an expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Store a value; skipped if it was computed before the last invalidation"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "generation": self.generation,
+        }
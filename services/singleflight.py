@@ -0,0 +1,59 @@
+# services/singleflight.py
+
+"""
+Request coalescing for the Travel Assistant Chatbot.
+
+Concurrent callers asking for the same thing (same tool call, same stateless
+completion) share one in-flight task instead of each hitting the upstream API.
+"""
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def make_key(*parts: Any) -> str:
+    """Build a stable coalescing key from JSON-serializable parts"""
+    return json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+
+
+class SingleFlight:
+    """Share one in-flight task between concurrent identical calls"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key, or join the call already running for it"""
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+
+            def _release(done: asyncio.Future, key: Hashable = key):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+
+            task.add_done_callback(_release)
+        else:
+            self.coalesced += 1
+
+        # Shield so one cancelled caller does not cancel the shared upstream call
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def stats(self) -> Dict[str, Any]:
+        """Return coalescing counters for the stats endpoint"""
+        total = self.calls + self.coalesced
+        return {
+            "upstream_calls": self.calls,
+            "coalesced_calls": self.coalesced,
+            "in_flight": len(self._inflight),
+            "coalesce_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,74 @@
+# services/speech.py
+
+"""
+Local text-to-speech for the Travel Assistant Chatbot.
+
+torch, transformers, librosa and soundfile together take seconds to import,
+so they are only imported when a model is loaded or audio is encoded. Code
+that never synthesizes speech never pays for them.
+"""
+
+import base64
+import threading
+from io import BytesIO
+from typing import Any, Optional
+
+import numpy as np
+
+DEFAULT_TTS_MODEL = "facebook/mms-tts-eng"
+
+
+def time_stretch(waveform: np.ndarray, speed: float) -> np.ndarray:
+    """Change playback speed (clamped to 0.5-2x) without changing pitch"""
+    if speed == 1.0:
+        return waveform
+    import librosa
+    return librosa.effects.time_stretch(waveform, rate=max(0.5, min(2.0, speed)))
+
+
+def encode_wav_base64(waveform: np.ndarray, sample_rate: int) -> str:
+    """WAV-encode a waveform in memory and return it base64 encoded"""
+    import soundfile as sf
+    with BytesIO() as audio_buffer:
+        sf.write(audio_buffer, waveform, sample_rate, format='WAV')
+        return base64.b64encode(audio_buffer.getvalue()).decode('utf-8')
+
+
+class LocalSpeechSynthesizer:
+    """VITS text-to-speech on CPU; the model and its dependencies load on first use"""
+
+    def __init__(self, model_name: str = DEFAULT_TTS_MODEL):
+        self.model_name = model_name
+        self.model: Any = None
+        self.tokenizer: Any = None
+        self.sample_rate = 16000
+        self.load_attempted = False
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None
+
+    def load(self) -> bool:
+        with self._lock:
+            self.load_attempted = True
+            if self.model is None:
+                from transformers import VitsModel, AutoTokenizer
+                print("🔊 Initializing Text-to-Speech model...")
+                self.model = VitsModel.from_pretrained(self.model_name)
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                self.sample_rate = getattr(self.model.config, "sampling_rate", 16000)
+                print("✅ TTS model initialized successfully")
+        return True
+
+    def synthesize(self, text: str, speed: float = 1.0) -> Optional[str]:
+        """Base64 WAV audio for text, or None if the model is not loaded"""
+        if self.model is None:
+            return None
+        import torch
+
+        inputs = self.tokenizer(text, return_tensors="pt")
+        with torch.no_grad():
+            output = self.model(**inputs).waveform
+        waveform = time_stretch(output.squeeze().cpu().numpy(), speed)
+        return encode_wav_base64(waveform, self.sample_rate)
@@ -0,0 +1,151 @@
+# services/swr_cache.py
+
+"""
+Async TTL cache with stale-while-revalidate for upstream API results.
+
+A fresh entry is returned as is. An expired entry still inside its stale
+window is returned immediately while one background task refreshes it. Past
+the stale window the caller waits for the fetch. Concurrent misses for a key
+share one fetch. Error results ("negative" results) are cached briefly so a
+bad city name doesn't hit the API on every mention, and a failed refresh
+never replaces good data.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from services.singleflight import SingleFlight
+
+
+def is_error_result(value: Any) -> bool:
+    return isinstance(value, dict) and "error" in value
+
+
+class _Entry:
+    __slots__ = ("value", "fresh_until", "stale_until", "negative")
+
+    def __init__(self, value: Any, fresh_until: float, stale_until: float, negative: bool):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.negative = negative
+
+
+class StaleWhileRevalidateCache:
+    """LRU-bounded TTL cache whose expired entries are served while they refresh"""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 1024,
+        stale_ttl: float = 3600.0,
+        negative_ttl: float = 60.0,
+        is_negative: Callable[[Any], bool] = is_error_result,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.is_negative = is_negative
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._flight = SingleFlight(name)
+        self._refreshing: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: Hashable, value: Any, ttl: float):
+        now = self.clock()
+        negative = self.is_negative(value)
+        if negative:
+            existing = self._entries.get(key)
+            if existing is not None and not existing.negative and existing.stale_until > now:
+                # Keep serving the last good value rather than replacing it with an error,
+                # and hold off the next refresh for the negative TTL
+                existing.fresh_until = now + self.negative_ttl
+                self.refresh_failures += 1
+                return
+            entry = _Entry(value, now + self.negative_ttl, now + self.negative_ttl, True)
+        else:
+            entry = _Entry(value, now + ttl, now + ttl + self.stale_ttl, False)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        async def run():
+            value = await fetch()
+            self._store(key, value, ttl)
+            return value
+        return await self._flight.do(key, run)
+
+    def _refresh_in_background(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: float):
+        self.refreshes += 1
+        task = asyncio.ensure_future(self._fetch(key, fetch, ttl))
+        self._refreshing.add(task)
+
+        def _done(done: asyncio.Task):
+            self._refreshing.discard(done)
+            if not done.cancelled() and done.exception() is not None:
+                self.refresh_failures += 1
+                print(f"Background refresh failed in {self.name} cache: {done.exception()}")
+
+        task.add_done_callback(_done)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        """Cached value for key, fetching (or refreshing in the background) as needed"""
+        now = self.clock()
+        entry = self._entries.get(key)
+        if entry is not None and now < entry.stale_until:
+            self._entries.move_to_end(key)
+            if entry.negative:
+                self.negative_hits += 1
+            elif now < entry.fresh_until:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                if not self._flight.in_flight(key):
+                    self._refresh_in_background(key, fetch, ttl)
+            return entry.value
+
+        self.misses += 1
+        return await self._fetch(key, fetch, ttl)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def close(self):
+        """Cancel background refreshes still running"""
+        for task in list(self._refreshing):
+            task.cancel()
+        if self._refreshing:
+            await asyncio.gather(*self._refreshing, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        served = self.hits + self.stale_hits + self.negative_hits
+        total = served + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round(served / total, 4) if total else 0.0,
+            "background_refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "upstream": self._flight.stats(),
+        }
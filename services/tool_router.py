@@ -0,0 +1,147 @@
+# services/tool_router.py
+
+"""
+Per-turn tool-schema selection for the Travel Assistant Chatbot.
+
+A local keyword scorer decides which function schemas are worth sending with
+a turn, so small talk and pure knowledge questions do not pay the prompt
+tokens of every tool definition. No network calls are made.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+# Keywords (matched on word boundaries, case-insensitive) that signal each tool
+TOOL_KEYWORDS = {
+    "get_weather": [
+        "weather", "temperature", "temperatures", "rain", "raining", "rainy", "sunny", "snow",
+        "snowing", "hot", "cold", "warm", "humid", "humidity", "wind", "windy", "climate",
+        "umbrella", "degrees", "celsius", "fahrenheit",
+    ],
+    "get_forecast": [
+        "forecast", "forecasts", "tomorrow", "next week", "this week", "weekend", "coming days",
+        "next few days", "next days", "will it rain", "will it be",
+    ],
+    "search_flights": [
+        "flight", "flights", "fly", "flying", "airline", "airlines", "airfare", "plane",
+        "airport", "depart", "departure", "layover", "nonstop", "one-way", "round trip", "round-trip",
+    ],
+    "search_hotels": [
+        "hotel", "hotels", "stay", "staying", "accommodation", "accommodations", "room", "rooms",
+        "hostel", "hostels", "resort", "resorts", "check in", "check-in", "check out", "check-out",
+        "lodging", "airbnb", "guesthouse", "night", "nights",
+    ],
+    "get_attractions": [
+        "attraction", "attractions", "sightseeing", "things to do", "what to see", "places to visit",
+        "must see", "must-see", "museum", "museums", "park", "parks", "landmark", "landmarks",
+        "sights", "see", "visit", "visiting", "explore", "to do", "activities", "tour", "tours",
+    ],
+    "get_travel_tips": [
+        "tip", "tips", "advice", "etiquette", "culture", "customs", "safety", "safe", "prepare",
+        "packing", "pack", "currency", "visa", "tipping", "scam", "scams",
+    ],
+}
+
+# Future-time cues that turn a weather question into a forecast question
+# ("is it going to be sunny on Saturday?"); only applied when get_weather matched
+FORECAST_CUES = [
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "going to", "gonna", "will", "later", "tonight", "next", "upcoming", "days",
+]
+
+# Broad planning requests may need any tool, so they get the full set
+ALL_TOOLS_KEYWORDS = [
+    "trip", "travel plan", "plan", "planning", "itinerary", "vacation", "holiday", "getaway",
+]
+
+
+def _compile(keywords: List[str]) -> re.Pattern:
+    alternatives = sorted((re.escape(k) for k in keywords), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+
+
+class ToolSelector:
+    """Pick the function schemas relevant to a turn"""
+
+    def __init__(
+        self,
+        function_definitions: List[Dict[str, Any]],
+        keywords: Optional[Dict[str, List[str]]] = None,
+        stable_prefix: bool = False,
+    ):
+        self.function_definitions = function_definitions
+        self.stable_prefix = stable_prefix
+        self._by_name = {fn["name"]: fn for fn in function_definitions}
+        self._patterns = {name: _compile(words) for name, words in (keywords or TOOL_KEYWORDS).items()}
+        self._all_pattern = _compile(ALL_TOOLS_KEYWORDS)
+        self._forecast_cue_pattern = _compile(FORECAST_CUES)
+        # Serialized size of each schema, computed once, used for token accounting
+        self._schema_tokens = {
+            fn["name"]: len(json.dumps(fn, separators=(",", ":"))) // 4 for fn in function_definitions
+        }
+        self._full_tokens = sum(self._schema_tokens.values())
+        self.turns = 0
+        self.turns_without_tools = 0
+        self.schema_tokens_sent = 0
+        self.schema_tokens_saved = 0
+
+    def score(self, text: str) -> Dict[str, int]:
+        """Return keyword hit counts per tool for a piece of text"""
+        return {name: len(pattern.findall(text)) for name, pattern in self._patterns.items()}
+
+    def needs_tools(self, message: str) -> bool:
+        """Return True if the message alone signals any tool (no counters updated)"""
+        if self._all_pattern.search(message):
+            return True
+        return any(pattern.search(message) for pattern in self._patterns.values())
+
+    def select(self, message: str, history: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Return the function schemas to send with this turn, in definition order"""
+        self.turns += 1
+        history = history or []
+
+        if self._all_pattern.search(message):
+            selected = set(self._by_name)
+        else:
+            # Score the message together with the previous user turn so short
+            # follow-ups ("and tomorrow?") keep their context
+            previous_user = next(
+                (msg.get("content") or "" for msg in reversed(history) if msg.get("role") == "user"), ""
+            )
+            text = f"{previous_user}\n{message}"
+            scores = self.score(text)
+            selected = {name for name, hits in scores.items() if hits > 0}
+            if "get_weather" in selected and "get_forecast" in self._by_name and self._forecast_cue_pattern.search(text):
+                selected.add("get_forecast")
+
+            # Tools used recently in the conversation stay available for follow-ups
+            for msg in history[-6:]:
+                if msg.get("role") == "function" and msg.get("name") in self._by_name:
+                    selected.add(msg["name"])
+
+        tools = [fn for fn in self.function_definitions if fn["name"] in selected]
+        if not tools:
+            self.turns_without_tools += 1
+        return tools
+
+    def request_functions(self, selected: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the schemas to actually send for a selection.
+
+        With stable_prefix, any non-empty selection is widened to the full list
+        so the serialized tool block stays byte-identical for prompt caching.
+        """
+        tools = self.function_definitions if (self.stable_prefix and selected) else selected
+        sent = sum(self._schema_tokens[fn["name"]] for fn in tools)
+        self.schema_tokens_sent += sent
+        self.schema_tokens_saved += self._full_tokens - sent
+        return tools
+
+    def stats(self) -> Dict[str, Any]:
+        """Return selection counters for the stats endpoint"""
+        return {
+            "turns": self.turns,
+            "turns_without_tools": self.turns_without_tools,
+            "schema_tokens_sent": self.schema_tokens_sent,
+            "schema_tokens_saved": self.schema_tokens_saved,
+        }
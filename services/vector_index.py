@@ -0,0 +1,119 @@
+# services/vector_index.py
+
+"""
+In-process vector index for the Travel Assistant Chatbot.
+
+Holds a small corpus (the static travel knowledge base) as one contiguous,
+L2-normalized NumPy matrix. Top-k search is one matrix-vector product plus
+argpartition, so lookups do no I/O and take microseconds.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class VectorIndex:
+    """Exact cosine top-k over an in-memory matrix"""
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        vectors: Any,
+        documents: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        dtype: Any = np.float32,
+        normalized: bool = False,
+    ):
+        # Pre-normalized vectors of the right dtype (e.g. a memory-mapped .npy) are used without a copy
+        if normalized and isinstance(vectors, np.ndarray) and vectors.dtype == np.dtype(dtype) and vectors.flags.c_contiguous:
+            if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+                raise ValueError(f"Expected {len(ids)} vectors, got array of shape {vectors.shape}")
+            self.matrix = vectors
+        else:
+            matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+            if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+                raise ValueError(f"Expected {len(ids)} vectors, got array of shape {matrix.shape}")
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.matrix = np.ascontiguousarray((matrix / norms).astype(dtype))
+        self.ids = list(ids)
+        self.documents = list(documents) if documents is not None else [""] * len(self.ids)
+        self.metadatas = list(metadatas) if metadatas is not None else [{} for _ in self.ids]
+        self._partitions: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    def _prepare(self, queries: Any) -> np.ndarray:
+        q = np.asarray(queries, dtype=np.float32)
+        if q.ndim == 1:
+            q = q[None, :]
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (q / norms).astype(self.matrix.dtype)
+
+    def partition(self, metadata_filter: Any):
+        """Row ids and sub-matrix for entries matching a filter (anything with .matches(metadata)).
+
+        Partitions are computed once per distinct filter (keyed by repr) and reused.
+        """
+        key = repr(metadata_filter)
+        if key not in self._partitions:
+            rows = np.array(
+                [i for i, metadata in enumerate(self.metadatas) if metadata_filter.matches(metadata or {})],
+                dtype=np.int64,
+            )
+            self._partitions[key] = (rows, np.ascontiguousarray(self.matrix[rows]))
+        return self._partitions[key]
+
+    def search_batch(self, queries: Any, k: int = 3, metadata_filter: Any = None) -> List[List[Dict[str, Any]]]:
+        """Top-k for each query row. Distances use Chroma's squared-L2 scale (2 - 2 * cosine)"""
+        n_queries = len(np.atleast_2d(queries))
+        if metadata_filter is None:
+            rows, matrix = None, self.matrix
+        else:
+            rows, matrix = self.partition(metadata_filter)
+        if not len(matrix):
+            return [[] for _ in range(n_queries)]
+        q = self._prepare(queries)
+        scores = (q @ matrix.T).astype(np.float32)
+        k = min(k, scores.shape[1])
+
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        query_rows = np.arange(scores.shape[0])[:, None]
+        order = np.argsort(-scores[query_rows, top], axis=1)
+        top = top[query_rows, order]
+
+        results = []
+        for row, indices in enumerate(top):
+            hits = []
+            for i in indices:
+                entry = i if rows is None else rows[i]
+                hits.append({
+                    "id": self.ids[entry],
+                    "document": self.documents[entry],
+                    "metadata": self.metadatas[entry],
+                    "distance": float(2.0 - 2.0 * scores[row, i]),
+                })
+            results.append(hits)
+        return results
+
+    def search(self, query: Any, k: int = 3, metadata_filter: Any = None) -> List[Dict[str, Any]]:
+        return self.search_batch(query, k, metadata_filter)[0]
+
+    @classmethod
+    def from_collection(cls, collection: Any, dtype: Any = np.float32) -> "VectorIndex":
+        """Load every stored embedding from a ChromaDB collection"""
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data.get("embeddings")
+        if embeddings is None or len(embeddings) == 0:
+            return cls([], np.zeros((0, 1), dtype=np.float32), dtype=dtype)
+        return cls(data["ids"], embeddings, data.get("documents"), data.get("metadatas"), dtype=dtype)
@@ -0,0 +1,110 @@
+# services/weather.py
+
+"""
+Weather data layer for the Travel Assistant Chatbot.
+
+One call to the 5-day/3-hour forecast endpoint returns everything the weather
+tools need. The series is parsed once into arrays; current conditions come
+from the slot covering "now" and daily summaries are min/max/mean over every
+3-hour slot of each local day, rather than one sampled slot per day. Callers
+cache the parsed series, so a turn that asks for both today's weather and the
+coming days makes a single upstream request.
+"""
+
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+# The free forecast endpoint returns at most 5 days of 3-hour slots
+MAX_FORECAST_SLOTS = 40
+SLOT_SECONDS = 3 * 3600
+
+
+class ForecastSeries:
+    """Parsed 3-hour forecast slots for one city, as parallel arrays"""
+
+    def __init__(self, city: str, country: str, utc_offset: int, slots: List[Dict[str, Any]]):
+        self.city = city
+        self.country = country
+        self.utc_offset = utc_offset
+        self.timestamps = np.array([slot["dt"] for slot in slots], dtype=np.int64)
+        self.temperature = np.array([slot["main"]["temp"] for slot in slots], dtype=np.float64)
+        self.feels_like = np.array([slot["main"].get("feels_like", slot["main"]["temp"]) for slot in slots], dtype=np.float64)
+        self.humidity = np.array([slot["main"]["humidity"] for slot in slots], dtype=np.float64)
+        self.wind_speed = np.array([slot.get("wind", {}).get("speed", 0.0) for slot in slots], dtype=np.float64)
+        self.descriptions = [slot["weather"][0]["description"] if slot.get("weather") else "" for slot in slots]
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any]) -> "ForecastSeries":
+        # The API returns slots in time order; sort anyway since daily grouping relies on it
+        slots = sorted(data["list"], key=lambda slot: slot["dt"])
+        city = data.get("city", {})
+        return cls(city.get("name", ""), city.get("country", ""), int(city.get("timezone", 0)), slots)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def current(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Conditions for the slot covering now (the first slot if the series starts later)"""
+        now = time.time() if now is None else now
+        # A slot stamped t describes the window [t - 1.5h, t + 1.5h)
+        index = int(np.searchsorted(self.timestamps, now - SLOT_SECONDS / 2, side="right"))
+        index = min(index, len(self) - 1)
+        return {
+            "city": self.city,
+            "country": self.country,
+            "temperature": round(float(self.temperature[index]), 1),
+            "feels_like": round(float(self.feels_like[index]), 1),
+            "humidity": int(self.humidity[index]),
+            "description": self.descriptions[index],
+            "wind_speed": round(float(self.wind_speed[index]), 1),
+            "as_of": time.strftime("%Y-%m-%d %H:%M", time.gmtime(int(self.timestamps[index]) + self.utc_offset))
+        }
+
+    def daily(self, days: int = 5) -> List[Dict[str, Any]]:
+        """Per local day: min/max/mean temperature and mean humidity over all of that day's slots"""
+        local_day = (self.timestamps + self.utc_offset) // 86400
+        day_ids, starts, counts = np.unique(local_day, return_index=True, return_counts=True)
+        temp_min = np.minimum.reduceat(self.temperature, starts)
+        temp_max = np.maximum.reduceat(self.temperature, starts)
+        temp_mean = np.add.reduceat(self.temperature, starts) / counts
+        humidity_mean = np.add.reduceat(self.humidity, starts) / counts
+
+        summaries = []
+        for i in range(min(days, len(day_ids))):
+            descriptions = self.descriptions[starts[i]:starts[i] + counts[i]]
+            summaries.append({
+                "date": time.strftime("%Y-%m-%d", time.gmtime(int(day_ids[i]) * 86400)),
+                "temperature": round(float(temp_mean[i]), 1),
+                "temp_min": round(float(temp_min[i]), 1),
+                "temp_max": round(float(temp_max[i]), 1),
+                "description": Counter(descriptions).most_common(1)[0][0],
+                "humidity": round(float(humidity_mean[i])),
+                "slots": int(counts[i])
+            })
+        return summaries
+
+
+async def fetch_forecast_series(
+    client: httpx.AsyncClient,
+    base_url: str,
+    api_key: str,
+    city: str,
+    country: str = "",
+    units: str = "metric",
+) -> Any:
+    """The full forecast series for a city, or an {"error": ...} dict"""
+    query = f"{city},{country}" if country else city
+    response = await client.get(
+        f"{base_url}/forecast",
+        params={"q": query, "appid": api_key, "units": units, "cnt": MAX_FORECAST_SLOTS}
+    )
+    if response.status_code != 200:
+        return {"error": f"Weather data not found for {city}"}
+    series = ForecastSeries.from_payload(response.json())
+    if not len(series):
+        return {"error": f"Weather data not found for {city}"}
+    return series
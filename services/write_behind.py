@@ -0,0 +1,138 @@
+# services/write_behind.py
+
+"""
+Write-behind batching for the Travel Assistant Chatbot.
+
+Records are queued on the request path and written in the background in
+batches, flushed when a batch fills up or when the oldest queued record has
+waited long enough. Whatever is still queued is flushed on shutdown, within a
+timeout so a stuck writer cannot hang the process.
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class WriteBehindQueue:
+    """Batch records and hand them to a blocking flush function off the event loop"""
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Any]], None],
+        max_batch: int = 32,
+        max_delay: float = 1.0,
+        max_queue: int = 10000,
+        executor: Optional[Executor] = None,
+    ):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.executor = executor
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.dropped = 0
+        self._in_flight = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._closing = False
+            self._task = asyncio.ensure_future(self._run())
+
+    def enqueue(self, record: Any) -> bool:
+        """Queue a record; returns False if the writer is not running or the queue is full"""
+        if not self.running or self._closing:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _flush(self, batch: List[Any]):
+        loop = asyncio.get_running_loop()
+        self._in_flight = len(batch)
+        try:
+            await loop.run_in_executor(self.executor, self.flush_fn, batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"Error flushing write-behind batch of {len(batch)}: {e}")
+        finally:
+            self._in_flight = 0
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            await self._flush(batch)
+            if stop:
+                break
+
+        # Drain anything queued behind the stop marker
+        leftover = []
+        while not self._queue.empty():
+            record = self._queue.get_nowait()
+            if record is not None:
+                leftover.append(record)
+        for start in range(0, len(leftover), self.max_batch):
+            await self._flush(leftover[start:start + self.max_batch])
+
+    async def close(self, timeout: float = 10.0):
+        """Stop accepting records and flush everything still queued, giving up after timeout seconds"""
+        if not self.running:
+            return
+        self._closing = True
+        deadline = time.monotonic() + timeout
+        try:
+            await asyncio.wait_for(self._queue.put(None), timeout=timeout)
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            dropped = self._in_flight
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            while not self._queue.empty():
+                if self._queue.get_nowait() is not None:
+                    dropped += 1
+            self.dropped += dropped
+            print(f"⚠️ Write-behind flush did not finish within {timeout:g}s; dropped {dropped} records")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,29 @@
+# tests/test_import_budget.py
+
+"""Heavy optional dependencies must stay out of module import; main must import within budget"""
+
+import os
+
+import pytest
+
+from benchmarks.import_time_bench import LAZY_PACKAGES, eager_packages, import_profile
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2000"))
+
+
+def test_speech_and_export_modules_import_no_heavy_packages():
+    _, _, imported = import_profile("services.speech, services.exports")
+    assert eager_packages(imported) == []
+
+
+def test_main_imports_lazily_and_within_budget():
+    pytest.importorskip("chromadb")
+    pytest.importorskip("fastapi")
+    _, total_us, imported = import_profile("main")
+    assert eager_packages(imported) == []
+    assert total_us / 1000 <= IMPORT_BUDGET_MS
+
+
+def test_lazy_package_list_covers_the_speech_and_export_stack():
+    for package in ("torch", "transformers", "librosa", "soundfile", "scipy", "pandas", "openpyxl", "sentence_transformers"):
+        assert package in LAZY_PACKAGES
@@ -0,0 +1,124 @@
+# tests/test_knowledge_artifact.py
+
+"""A fresh node syncs the knowledge base from the shipped artifact without embedding calls"""
+
+import hashlib
+
+import numpy as np
+import pytest
+
+from services.knowledge_artifact import KnowledgeArtifact, write_knowledge_artifact
+from services.knowledge_sync import knowledge_document, sync_knowledge
+
+MODEL_ID = "local:stub-model"
+
+
+class StubEmbedder:
+    """Deterministic vectors from a text hash; records every document it is asked to embed"""
+
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.calls = []
+
+    def __call__(self, documents):
+        self.calls.append(list(documents))
+        return [
+            np.frombuffer(hashlib.sha256(document.encode("utf-8")).digest()[:self.dim * 4], dtype=np.uint32)
+            .astype(np.float32) / 2 ** 32 - 0.5
+            for document in documents
+        ]
+
+    @property
+    def embedded(self):
+        return [document for call in self.calls for document in call]
+
+
+class MemoryCollection:
+    """The slice of a ChromaDB collection that sync_knowledge uses"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get(self, include=()):
+        ids = list(self.rows)
+        return {"ids": ids, "metadatas": [self.rows[doc_id]["metadata"] for doc_id in ids]}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for doc_id, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+            self.rows[doc_id] = {"embedding": np.asarray(embedding), "document": document, "metadata": metadata}
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.rows.pop(doc_id, None)
+
+
+def make_entries():
+    return [
+        {"title": "Packing light", "content": "Roll clothes and bring one pair of shoes.", "category": "packing"},
+        {"title": "Tokyo transit", "content": "Get a Suica card for trains and buses.", "region": "asia"},
+        {"title": "Euro tipping", "content": "Rounding up is usually enough in cafes.", "region": "europe"},
+    ]
+
+
+@pytest.fixture
+def artifact_prefix(tmp_path):
+    entries = make_entries()
+    builder = StubEmbedder()
+    prefix = str(tmp_path / "knowledge_embeddings")
+    write_knowledge_artifact(prefix, entries, builder([knowledge_document(entry) for entry in entries]), MODEL_ID)
+    return prefix
+
+
+def test_load_memory_maps_the_matrix(artifact_prefix):
+    artifact = KnowledgeArtifact.load(artifact_prefix, model_id=MODEL_ID)
+    assert isinstance(artifact.vectors, np.memmap)
+    assert artifact.covers(make_entries())
+    assert np.allclose(np.linalg.norm(artifact.vectors, axis=1), 1.0, atol=1e-5)
+
+
+def test_artifact_from_another_model_is_ignored(artifact_prefix, tmp_path):
+    assert KnowledgeArtifact.load(artifact_prefix, model_id="openai:text-embedding-3-small") is None
+    assert KnowledgeArtifact.load(str(tmp_path / "missing")) is None
+
+
+def test_fresh_node_sync_makes_no_embedding_calls(artifact_prefix):
+    entries = make_entries()
+    artifact = KnowledgeArtifact.load(artifact_prefix, model_id=MODEL_ID)
+    embedder = StubEmbedder()
+    collection = MemoryCollection()
+
+    result = sync_knowledge(collection, entries, artifact.embedding_function(entries, embedder))
+
+    assert embedder.calls == []
+    assert result.added == len(entries)
+    for row, doc_id in enumerate(artifact.ids):
+        assert np.allclose(collection.rows[doc_id]["embedding"], artifact.vectors[row])
+
+
+def test_only_edited_entries_are_re_embedded(artifact_prefix):
+    entries = make_entries()
+    entries[1] = dict(entries[1], content="Get a Suica or Pasmo card for trains and buses.")
+    artifact = KnowledgeArtifact.load(artifact_prefix, model_id=MODEL_ID)
+    embedder = StubEmbedder()
+    collection = MemoryCollection()
+
+    result = sync_knowledge(collection, entries, artifact.embedding_function(entries, embedder))
+
+    assert embedder.embedded == [knowledge_document(entries[1])]
+    assert result.added == len(entries)
+    assert not artifact.covers(entries)
+    # The index built from the artifact keeps only the entries it still matches
+    assert len(artifact.index(entries)) == len(entries) - 1
+
+
+def test_restart_with_unchanged_entries_embeds_nothing(artifact_prefix):
+    entries = make_entries()
+    artifact = KnowledgeArtifact.load(artifact_prefix, model_id=MODEL_ID)
+    embedder = StubEmbedder()
+    collection = MemoryCollection()
+    sync_knowledge(collection, entries, artifact.embedding_function(entries, embedder))
+
+    result = sync_knowledge(collection, entries, embedder)
+
+    assert embedder.calls == []
+    assert result.unchanged == len(entries) and not result.changed
@@ -0,0 +1,68 @@
+# tests/test_tool_router.py
+
+"""Regression tests: prompts that need tools must still get their schemas"""
+
+import pytest
+
+from services.tool_router import ToolSelector
+
+TOOL_NAMES = ["get_weather", "get_forecast", "search_flights", "search_hotels", "get_attractions", "get_travel_tips"]
+
+
+@pytest.fixture
+def selector():
+    definitions = [
+        {"name": name, "description": name, "parameters": {"type": "object", "properties": {}}}
+        for name in TOOL_NAMES
+    ]
+    return ToolSelector(definitions)
+
+
+def selected_names(selector, message, history=None):
+    return {fn["name"] for fn in selector.select(message, history)}
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("What's the weather in Tokyo right now?", {"get_weather"}),
+    ("Is it going to be sunny in Madrid on Saturday?", {"get_weather", "get_forecast"}),
+    ("what will the weather be like on Friday in Paris", {"get_weather", "get_forecast"}),
+    ("Will it rain in London tomorrow?", {"get_weather", "get_forecast"}),
+    ("Give me the 5 day forecast for Rome", {"get_forecast"}),
+    ("How cold does it get in Oslo over the next few days?", {"get_weather", "get_forecast"}),
+    ("Find me flights from Boston to Lisbon", {"search_flights"}),
+    ("I need a hotel in Barcelona for 3 nights", {"search_hotels"}),
+    ("What are the must-see attractions in Prague?", {"get_attractions"}),
+    ("Any etiquette tips for Japan?", {"get_travel_tips"}),
+])
+def test_tool_needing_prompts_get_their_tools(selector, message, expected):
+    assert expected <= selected_names(selector, message)
+
+
+def test_current_weather_alone_does_not_pull_in_forecast(selector):
+    assert "get_forecast" not in selected_names(selector, "What's the temperature in Cairo?")
+
+
+def test_weekday_without_weather_does_not_pull_in_forecast(selector):
+    assert "get_forecast" not in selected_names(selector, "Find a flight to Denver on Saturday")
+
+
+def test_planning_requests_get_every_tool(selector):
+    assert selected_names(selector, "Help me plan a trip to Peru") == set(TOOL_NAMES)
+
+
+def test_small_talk_gets_no_tools(selector):
+    assert selected_names(selector, "Hi there, thanks so much!") == set()
+    assert selector.stats()["turns_without_tools"] == 1
+
+
+def test_follow_up_keeps_previous_turn_context(selector):
+    history = [{"role": "user", "content": "What's the weather in Lima?"}]
+    assert "get_forecast" in selected_names(selector, "And tomorrow?", history)
+
+
+def test_recently_used_tools_stay_available(selector):
+    history = [
+        {"role": "user", "content": "Hotels in Nice please"},
+        {"role": "function", "name": "search_hotels", "content": "{}"},
+    ]
+    assert "search_hotels" in selected_names(selector, "Which one is cheapest?", history)